@@ -4,7 +4,7 @@
 
 import logging
 import sys
-from app.model_loader import load_config # Import the configuration loading function.
+from app.settings import load_config # Import the configuration loading function (loads no model).
 
 # Load configuration on import to get paths and other parameters.
 config = load_config() 
@@ -0,0 +1,140 @@
+import asyncio
+import math
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List
+from fastapi.concurrency import run_in_threadpool
+from app.model_loader import get_config
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_HEADER = 'X-Request-Timeout' # Seconds the client is willing to wait.
+DEADLINE_HEADER = 'X-Request-Deadline' # Absolute Unix timestamp (seconds).
+
+# Global variable to cache the controller, like the model in app.model_loader.
+CONTROLLER = None
+
+
+class RequestRejected(Exception):
+    """Raised when a request is shed or cannot finish before its deadline."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def parse_deadline(timeout: str | None, deadline: str | None) -> float | None:
+    """Converts the timeout/deadline headers into a time.monotonic() deadline (the earliest wins)."""
+    now_monotonic, now_wall = time.monotonic(), time.time()
+    candidates = []
+    try:
+        if timeout is not None:
+            candidates.append(now_monotonic + float(timeout))
+        if deadline is not None:
+            candidates.append(now_monotonic + (float(deadline) - now_wall))
+    except ValueError:
+        raise RequestRejected(400, f"Invalid {TIMEOUT_HEADER} or {DEADLINE_HEADER} header.")
+    return min(candidates) if candidates else None
+
+
+class AdmissionController:
+    """Admission control and load shedding for prediction batches.
+
+    At most `max_concurrent_batches` batches run at once; the rest wait. The
+    per-machine service time is measured as an exponential moving average and
+    used to estimate the queueing delay, from the machines waiting for a slot
+    plus, when every slot is busy, the remaining work of the running batches.
+    New requests are shed (503) when that delay exceeds `max_queue_delay_s`, and rejected (504) when not even one of
+    their machines could finish before the deadline. Once a batch starts, the
+    deadline is passed down so machines not reached in time come back marked as
+    timed out.
+    """
+
+    def __init__(self, max_concurrent_batches=4, max_queue_delay_s=2.0, initial_machine_seconds=0.05, ewma_alpha=0.2):
+        self.max_concurrent_batches = max_concurrent_batches
+        self.max_queue_delay_s = max_queue_delay_s
+        self.machine_seconds = initial_machine_seconds
+        self.ewma_alpha = ewma_alpha
+        self.waiting_machines = 0 # Machines of admitted batches still waiting for a slot.
+        self._running = {} # Running batch -> (machines, start time).
+        self.counters = {'completed': 0, 'partial': 0, 'shed': 0, 'expired': 0}
+        self._semaphore = asyncio.Semaphore(max_concurrent_batches)
+        self._lock = threading.Lock()
+
+    def _queue_delay(self):
+        """Estimated wait before a new batch gets a slot; zero while a slot is free."""
+        work = self.waiting_machines * self.machine_seconds
+        if len(self._running) >= self.max_concurrent_batches:
+            now = time.monotonic()
+            work += sum(max(0.0, n * self.machine_seconds - (now - start)) for n, start in self._running.values())
+        return work / self.max_concurrent_batches
+
+    def _admit(self, n_machines, deadline):
+        with self._lock:
+            queue_delay = self._queue_delay()
+            if queue_delay > self.max_queue_delay_s:
+                self.counters['shed'] += 1
+                raise RequestRejected(503, f"Server overloaded: estimated queueing delay {queue_delay:.1f}s.")
+            # Admit as long as at least one machine can finish in time; the rest may come back timed out.
+            if deadline is not None and time.monotonic() + queue_delay + self.machine_seconds > deadline:
+                self.counters['expired'] += 1
+                raise RequestRejected(504, "Request cannot be completed before its deadline.")
+            self.waiting_machines += n_machines
+
+    def _record(self, elapsed, results):
+        processed = sum(1 for r in results if not r.get('timedOut'))
+        with self._lock:
+            if processed:
+                self.machine_seconds += self.ewma_alpha * (elapsed / processed - self.machine_seconds)
+            self.counters['partial' if processed < len(results) else 'completed'] += 1
+
+    async def run(self, n_machines: int, deadline: float | None, func: Callable[[float | None], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Admits a batch of `n_machines`, waits for a slot and runs func(deadline) in a worker thread."""
+        self._admit(n_machines, deadline)
+        batch = object()
+        try:
+            async with self._semaphore:
+                with self._lock:
+                    self.waiting_machines -= n_machines
+                    self._running[batch] = (n_machines, time.monotonic())
+                # Drop the work before preprocessing if not even one machine can finish in time.
+                if deadline is not None and time.monotonic() + self.machine_seconds > deadline:
+                    with self._lock:
+                        self.counters['expired'] += 1
+                    raise RequestRejected(504, "Request deadline expired while queued.")
+                start = time.monotonic()
+                results = await run_in_threadpool(func, deadline)
+                self._record(time.monotonic() - start, results)
+                return results
+        finally:
+            with self._lock:
+                if self._running.pop(batch, None) is None:
+                    self.waiting_machines -= n_machines # Never got a slot (e.g. cancelled).
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the admission counters and the current service-time estimate."""
+        with self._lock:
+            return {
+                **self.counters,
+                'waitingMachines': self.waiting_machines,
+                'runningBatches': len(self._running),
+                'machineServiceMs': self.machine_seconds * 1000,
+                'estimatedQueueDelayMs': self._queue_delay() * 1000,
+                # Machines per second the server can sustain at the measured service time.
+                'estimatedCapacityMachinesPerSecond': self.max_concurrent_batches / self.machine_seconds if self.machine_seconds else math.inf
+            }
+
+
+def get_admission_controller():
+    """Returns the admission controller configured in config.yaml, creating it on first use."""
+    global CONTROLLER
+    if CONTROLLER is None:
+        admission_cfg = get_config().get('admission', {})
+        CONTROLLER = AdmissionController(
+            max_concurrent_batches=admission_cfg.get('max_concurrent_batches', 4),
+            max_queue_delay_s=admission_cfg.get('max_queue_delay_ms', 2000) / 1000,
+            initial_machine_seconds=admission_cfg.get('initial_machine_ms', 50) / 1000
+        )
+    return CONTROLLER
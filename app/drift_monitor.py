@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Any
+from src.drift import population_stability_index, histogram_quantiles
+from app.model_loader import BASE_DIR, get_config
+
+logger = logging.getLogger(__name__)
+
+REPORTED_QUANTILES = [0.05, 0.5, 0.95]
+
+# Global variable to cache the monitor, like the model in app.model_loader.
+MONITOR = None
+_MONITOR_LOADED = False
+
+
+class ColumnSketch:
+    """Fixed-size streaming sketch of one column over the reference profile's bins.
+
+    Keeps bin counts, missing and out-of-range counters and the observed min/max,
+    so memory does not grow with traffic.
+    """
+
+    def __init__(self, reference):
+        self.reference = reference
+        self.edges = np.asarray(reference['edges'])
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.missing = 0
+        self.below_range = 0
+        self.above_range = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        missing = np.isnan(values)
+        finite = values[~missing]
+        self.missing += int(missing.sum())
+        if len(finite) == 0:
+            return
+        self.counts += np.bincount(np.searchsorted(self.edges, finite, side='right'), minlength=len(self.counts))
+        self.below_range += int((finite < self.reference['min']).sum())
+        self.above_range += int((finite > self.reference['max']).sum())
+        self.min = min(self.min, float(finite.min()))
+        self.max = max(self.max, float(finite.max()))
+
+    def report(self):
+        observed = int(self.counts.sum())
+        seen = observed + self.missing
+        low = min(self.min, self.edges[0]) if len(self.edges) else self.min
+        high = max(self.max, self.edges[-1]) if len(self.edges) else self.max
+        return {
+            'count': observed,
+            'psi': population_stability_index(self.reference['proportions'], self.counts),
+            'quantiles': dict(zip(
+                [f'p{int(q * 100)}' for q in REPORTED_QUANTILES],
+                histogram_quantiles(self.edges, self.counts, low, high, REPORTED_QUANTILES)
+            )),
+            'missingRate': self.missing / seen if seen else 0.0,
+            'referenceMissingRate': self.reference['missing_rate'],
+            'outOfRangeRate': (self.below_range + self.above_range) / observed if observed else 0.0
+        }
+
+
+class DriftMonitor:
+    """Compares live raw telemetry and engineered features against the training reference profile."""
+
+    def __init__(self, profile):
+        self.raw = {col: ColumnSketch(ref) for col, ref in profile['raw'].items()}
+        self.features = {col: ColumnSketch(ref) for col, ref in profile['features'].items()}
+        self.requests = 0
+        self.update_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, df_telemetry: pd.DataFrame | None, X_features: pd.DataFrame | None) -> None:
+        """Adds one request's raw telemetry rows and scored feature rows to the sketches."""
+        start = time.perf_counter()
+        with self._lock:
+            for sketches, df in ((self.raw, df_telemetry), (self.features, X_features)):
+                if df is None or df.empty:
+                    continue
+                columns = [col for col in sketches if col in df.columns]
+                # One conversion to a float matrix is much cheaper than one per column.
+                values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+                for i, col in enumerate(columns):
+                    sketches[col].update(values[:, i])
+            self.requests += 1
+            self.update_seconds += time.perf_counter() - start
+
+    def report(self) -> Dict[str, Any]:
+        """Returns drift scores per column and the average cost of an update per request."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'avgUpdateMs': self.update_seconds / self.requests * 1000 if self.requests else 0.0,
+                'raw': {col: sketch.report() for col, sketch in self.raw.items()},
+                'features': {col: sketch.report() for col, sketch in self.features.items()}
+            }
+
+
+def get_drift_monitor():
+    """Returns the drift monitor, or None if drift monitoring is disabled or has no reference profile."""
+    global MONITOR, _MONITOR_LOADED
+    if not _MONITOR_LOADED:
+        _MONITOR_LOADED = True
+        config = get_config()
+        if not config.get('drift', {}).get('enabled', False):
+            return None
+        profile_path = BASE_DIR / config['paths']['drift_reference']
+        try:
+            with open(profile_path, 'r') as f:
+                MONITOR = DriftMonitor(json.load(f))
+            logger.info(f"Drift reference profile loaded successfully from {profile_path}")
+        except FileNotFoundError:
+            logger.warning(f"Drift reference profile not found at: {profile_path}. Drift monitoring disabled.")
+    return MONITOR
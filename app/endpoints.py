@@ -1,7 +1,19 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header
+from fastapi.responses import FileResponse, PlainTextResponse
 from typing import List
-from app.schemas import PredictionInput, PredictionResponse, MachineDataInput, PredictionOutputRecord
-from app.inference import batch_predict
+from app.schemas import PredictionInput, PredictionResponse, MachineDataInput, PredictionOutputRecord, TelemetryRecord, ErrorRecord, MachineIdsInput, IngestResponse, JobInput, ExplanationOutputRecord, ExplanationResponse, MaintenanceInput, MaintenanceIndexResponse
+from app.inference import batch_predict, batch_predict_from_store, get_cascade_stats
+from app.telemetry_store import get_telemetry_store
+from app.drift_monitor import get_drift_monitor
+from app.explanations import batch_explain
+from app.profiling import get_request_profiler, SORT_KEYS
+from app.admission import get_admission_controller, parse_deadline, RequestRejected
+from app.jobs import get_job_manager, JobRejected
+from app.model_loader import ingest_maintenance, reload_maintenance_index
+from src.data import maintenance_coverage_end
+from datetime import datetime
+import pandas as pd
+from functools import partial
 import logging
 
 # Setup router and logger for this module
@@ -271,7 +283,10 @@ api_examples = {
              }
             )
 async def predict_failure_risk(
-    payload: PredictionInput = Body(...) 
+    payload: PredictionInput = Body(...),
+    x_profile_token: str | None = Header(None),
+    x_request_timeout: str | None = Header(None),
+    x_request_deadline: str | None = Header(None)
 ):
     """
     Endpoint to predict failure risk based on the last 24 hours of telemetry and error data.
@@ -281,10 +296,272 @@ async def predict_failure_risk(
         raise HTTPException(status_code=400, detail="Request body cannot be empty.")
 
     try:
-        predictions_raw = batch_predict(payload.root)
+        deadline = parse_deadline(x_request_timeout, x_request_deadline)
+        predictions_raw = await get_admission_controller().run(
+            len(payload.root),
+            deadline,
+            partial(get_request_profiler().run, "predict", batch_predict, payload.root, token=x_profile_token)
+        )
         response_data = [PredictionOutputRecord(**p) for p in predictions_raw]
         return PredictionResponse(root=response_data)
 
+    except RequestRejected as e:
+        logger.warning(f"Prediction request rejected: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         logger.error(f"Error during prediction: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/predict/explain",
+             response_model=ExplanationResponse,
+             summary="Explain Failure Risk",
+             description="Same input as /predict. Returns the failure risk of each machine and, for machines at or above the configured risk threshold, the contribution of each feature to the prediction.",
+             tags=["Predictions"])
+async def explain_failure_risk(
+    payload: PredictionInput = Body(...),
+    x_profile_token: str | None = Header(None),
+    x_request_timeout: str | None = Header(None),
+    x_request_deadline: str | None = Header(None)
+):
+    """
+    Endpoint to explain high failure risk predictions with per-feature contributions.
+    """
+    logger.info(f"Received explanation request for {len(payload.root)} machines.")
+    if not payload.root:
+        raise HTTPException(status_code=400, detail="Request body cannot be empty.")
+
+    try:
+        deadline = parse_deadline(x_request_timeout, x_request_deadline)
+        explanations_raw = await get_admission_controller().run(
+            len(payload.root),
+            deadline,
+            partial(get_request_profiler().run, "predict/explain", batch_explain, payload.root, token=x_profile_token)
+        )
+        response_data = [ExplanationOutputRecord(**e) for e in explanations_raw]
+        return ExplanationResponse(root=response_data)
+
+    except RequestRejected as e:
+        logger.warning(f"Explanation request rejected: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error during explanation: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.get("/cascade/stats",
+            summary="Cascade Statistics",
+            description="Reports how many machines were screened by the cascade and the fraction short-circuited before the full model.",
+            tags=["Predictions"])
+async def cascade_stats():
+    """
+    Endpoint to report the traffic short-circuited by cascade inference.
+    """
+    return get_cascade_stats()
+
+
+@router.get("/drift",
+            summary="Drift Report",
+            description="Compares live raw telemetry and engineered features with the training reference profile (PSI, quantiles, missing and out-of-range rates).",
+            tags=["Predictions"])
+async def drift_report():
+    """
+    Endpoint to report data drift and data quality of the traffic seen so far.
+    """
+    drift_monitor = get_drift_monitor()
+    if drift_monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring is disabled or no reference profile is available.")
+    return drift_monitor.report()
+
+
+@router.get("/admission/stats",
+            summary="Admission Statistics",
+            description="Counts of completed, partial (timed out), shed and expired prediction requests, with the measured per-machine service time.",
+            tags=["Predictions"])
+async def admission_stats():
+    """
+    Endpoint to report admission control and load shedding metrics for capacity sizing.
+    """
+    return get_admission_controller().stats()
+
+
+@router.post("/jobs",
+             status_code=202,
+             summary="Submit Bulk Scoring Job",
+             description="Queues a background job that scores the latest entry of every machine in a server-local telemetry file or data directory (with PdM_telemetry.csv and PdM_errors.csv). Returns the job ID and status.",
+             tags=["Jobs"])
+async def submit_job(payload: JobInput = Body(...)):
+    """
+    Endpoint to submit an asynchronous bulk scoring job.
+    """
+    try:
+        return get_job_manager().submit(payload.inputPath, payload.errorsPath)
+    except JobRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@router.get("/jobs/{job_id}",
+            summary="Get Job Status",
+            description="Reports a job's status, progress and rows per second, and the output location once completed.",
+            tags=["Jobs"])
+async def get_job(job_id: str):
+    """
+    Endpoint to check the status of a bulk scoring job.
+    """
+    status = get_job_manager().get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return status
+
+
+@router.post("/telemetry",
+             response_model=IngestResponse,
+             summary="Ingest Telemetry",
+             description="Stores telemetry readings in the server-side telemetry store, replacing readings with the same machine and timestamp.",
+             tags=["Telemetry Store"])
+async def ingest_telemetry(records: List[TelemetryRecord] = Body(...)):
+    """
+    Endpoint to bulk ingest telemetry readings.
+    """
+    try:
+        return IngestResponse(ingested=get_telemetry_store().ingest_telemetry(records))
+    except Exception as e:
+        logger.error(f"Error ingesting telemetry: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/errors",
+             response_model=IngestResponse,
+             summary="Ingest Errors",
+             description="Stores error events in the server-side telemetry store.",
+             tags=["Telemetry Store"])
+async def ingest_errors(records: List[ErrorRecord] = Body(...)):
+    """
+    Endpoint to bulk ingest error events.
+    """
+    try:
+        return IngestResponse(ingested=get_telemetry_store().ingest_errors(records))
+    except Exception as e:
+        logger.error(f"Error ingesting errors: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+def _maintenance_index_summary(maintenance_index):
+    coverage_end = maintenance_coverage_end(maintenance_index)
+    return MaintenanceIndexResponse(
+        machines=len(maintenance_index['machines']),
+        events=sum(len(timestamps) for machine_maint in maintenance_index['maintenance'].values() for timestamps in machine_maint.values()),
+        coverageEnd=str(pd.Timestamp(coverage_end)) if coverage_end is not None else None
+    )
+
+
+@router.post("/maintenance",
+             response_model=MaintenanceIndexResponse,
+             summary="Ingest Maintenance Events",
+             description="Merges maintenance events into the maintenance index without retraining and saves it, so the API, batch predictions and jobs all use it. coverageEnd (default: the newest event) records up to when the maintenance log is known to be complete and is reported back.",
+             tags=["Maintenance"])
+async def ingest_maintenance_events(payload: MaintenanceInput = Body(...)):
+    """
+    Endpoint to ingest maintenance events into the maintenance index.
+    """
+    try:
+        df_maint = pd.DataFrame([record.model_dump() for record in payload.records], columns=['datetime', 'machineID', 'comp'])
+        df_maint['datetime'] = pd.to_datetime(df_maint['datetime'])
+        return _maintenance_index_summary(ingest_maintenance(df_maint, payload.coverageEnd))
+    except Exception as e:
+        logger.error(f"Error ingesting maintenance events: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/maintenance/reload",
+             response_model=MaintenanceIndexResponse,
+             summary="Reload Maintenance Index",
+             description="Rebuilds the maintenance index from the configured machine metadata and maintenance log (paths.maintenance_machines and paths.maintenance_log) and saves it.",
+             tags=["Maintenance"])
+async def reload_maintenance(coverageEnd: datetime | None = None):
+    """
+    Endpoint to rebuild the maintenance index from the configured files.
+    """
+    try:
+        return _maintenance_index_summary(reload_maintenance_index(coverageEnd))
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reloading maintenance index: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/predict/stored",
+             response_model=PredictionResponse,
+             summary="Predict Failure Risk From Stored Telemetry",
+             description="Receives only machine IDs and predicts their failure risk from the last 24 hours of telemetry and errors held in the server-side store.",
+             tags=["Predictions"])
+async def predict_failure_risk_from_store(
+    payload: MachineIdsInput = Body(...),
+    x_profile_token: str | None = Header(None),
+    x_request_timeout: str | None = Header(None),
+    x_request_deadline: str | None = Header(None)
+):
+    """
+    Endpoint to predict failure risk for machines whose telemetry was ingested beforehand.
+    """
+    logger.info(f"Received stored-telemetry prediction request for {len(payload.machineIDs)} machines.")
+    if not payload.machineIDs:
+        raise HTTPException(status_code=400, detail="machineIDs cannot be empty.")
+
+    try:
+        deadline = parse_deadline(x_request_timeout, x_request_deadline)
+        predictions_raw = await get_admission_controller().run(
+            len(payload.machineIDs),
+            deadline,
+            partial(
+                get_request_profiler().run, "predict/stored", batch_predict_from_store,
+                payload.machineIDs, get_telemetry_store(), token=x_profile_token
+            )
+        )
+        response_data = [PredictionOutputRecord(**p) for p in predictions_raw]
+        return PredictionResponse(root=response_data)
+
+    except RequestRejected as e:
+        logger.warning(f"Prediction request rejected: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error during prediction: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+def _require_admin(x_admin_token):
+    if not get_request_profiler().is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+@router.get("/admin/profiles",
+            summary="List Request Profiles",
+            description="Lists the CPU profiles captured from inference calls, newest first. Requires the X-Admin-Token header.",
+            tags=["Admin"])
+async def list_profiles(x_admin_token: str | None = Header(None)):
+    """
+    Endpoint to list the saved request profiles.
+    """
+    _require_admin(x_admin_token)
+    return get_request_profiler().list_profiles()
+
+
+@router.get("/admin/profiles/{profile_id}",
+            summary="Get Request Profile",
+            description="Returns a text report of a captured profile, sorted by ?sort_by= (a pstats sort key, default 'cumulative'), or the raw pstats file with ?format=prof. Requires the X-Admin-Token header.",
+            tags=["Admin"])
+async def get_profile(profile_id: str, format: str = "text", sort_by: str = "cumulative", x_admin_token: str | None = Header(None)):
+    """
+    Endpoint to retrieve one saved request profile.
+    """
+    _require_admin(x_admin_token)
+    if sort_by not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort_by '{sort_by}'. Expected one of: {', '.join(SORT_KEYS)}.")
+    profiler = get_request_profiler()
+    path = profiler.get_profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found.")
+    if format == "prof":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    return PlainTextResponse(profiler.summarize(profile_id, sort_by=sort_by))
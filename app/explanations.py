@@ -0,0 +1,139 @@
+import hashlib
+import threading
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any
+from app.model_loader import get_config, get_model_registry, get_model_key, get_maintenance_version
+from app.inference import build_features_for_machine
+from app.schemas import MachineDataInput
+
+DEFAULT_RISK_THRESHOLD = 0.5
+DEFAULT_CACHE_SIZE = 10000
+
+
+class ExplanationCache:
+    """Bounded LRU cache of predictions and feature contributions.
+
+    Keyed by (input window hash, model version), so a retrained model never
+    serves explanations computed by its predecessor.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Global variable to cache the explanation cache, like the model in app.model_loader.
+CACHE = None
+
+def get_explanation_cache():
+    """Returns the explanation cache, creating it on first use."""
+    global CACHE
+    if CACHE is None:
+        CACHE = ExplanationCache(get_config().get('explanations', {}).get('cache_size', DEFAULT_CACHE_SIZE))
+    return CACHE
+
+
+def hash_input_window(machine_data: MachineDataInput) -> str:
+    """Returns a stable hash of a machine's telemetry and error window."""
+    return hashlib.sha256(machine_data.model_dump_json().encode()).hexdigest()
+
+
+def compute_contributions(model, X: pd.DataFrame) -> np.ndarray:
+    """Returns tree-SHAP contributions for every row of X in one booster call.
+
+    The last column is the bias term; each row sums to the model's log-odds output.
+    """
+    return model.get_booster().predict(xgb.DMatrix(X), pred_contribs=True)
+
+
+def batch_explain(batch_input: List[MachineDataInput], deadline: float | None = None) -> List[Dict[str, Any]]:
+    """
+    Predicts each machine's failure risk with the full model and, for machines at or above
+    the configured risk threshold, returns its per-feature contributions.
+
+    Machines are grouped by model, contributions of all flagged machines of a group come
+    from a single booster call, and results are cached by input window and model version.
+    Like predict_machines, machines not reached before a time.monotonic() `deadline` come
+    back marked as timed out.
+    """
+    registry = get_model_registry()
+    cache = get_explanation_cache()
+    risk_threshold = get_config().get('explanations', {}).get('risk_threshold', DEFAULT_RISK_THRESHOLD)
+
+    results = []
+    groups = {} # model key -> (result positions, cache keys, feature rows)
+    for machine_data in batch_input:
+        result = {
+            "machineId": machine_data.machineId,
+            "predictionDate": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "riskOfFailure": None,
+            "contributions": None
+        }
+        results.append(result)
+        if deadline is not None and time.monotonic() >= deadline:
+            result.update({"riskOfFailure": "N/A (Timed out)", "timedOut": True})
+            continue
+        try:
+            key = registry.resolve(get_model_key(machine_data.machineId))
+            cache_key = (hash_input_window(machine_data), registry.get_version(key), get_maintenance_version())
+            cached = cache.get(cache_key)
+            if cached is not None:
+                result.update(cached)
+                continue
+
+            _, model_features = registry.get(key)
+            X_predict, reason = build_features_for_machine(machine_data, model_features)
+            if X_predict is None:
+                result["riskOfFailure"] = reason
+                continue
+            positions, cache_keys, feature_rows = groups.setdefault(key, ([], [], []))
+            positions.append(len(results) - 1)
+            cache_keys.append(cache_key)
+            feature_rows.append(X_predict)
+        except Exception as e:
+            print(f"Error processing machine {machine_data.machineId}: {e}")
+            result["riskOfFailure"] = f"Error: {e}"
+
+    for key, (positions, cache_keys, feature_rows) in groups.items():
+        try:
+            model, model_features = registry.get(key)
+            X_group = pd.concat(feature_rows, ignore_index=True)
+            probabilities = model.predict_proba(X_group)[:, 1]
+            flagged = np.flatnonzero(probabilities >= risk_threshold)
+            contributions = compute_contributions(model, X_group.iloc[flagged]) if len(flagged) else None
+            contribution_rows = {int(row): j for j, row in enumerate(flagged)}
+
+            for i, (position, cache_key) in enumerate(zip(positions, cache_keys)):
+                explanation = {"riskOfFailure": f"{probabilities[i] * 100:.1f}%", "contributions": None}
+                if i in contribution_rows:
+                    row = contributions[contribution_rows[i]]
+                    feature_contributions = dict(zip(model_features, row[:-1].tolist()))
+                    explanation["contributions"] = dict(sorted(feature_contributions.items(), key=lambda item: -abs(item[1])))
+                    explanation["bias"] = float(row[-1])
+                results[position].update(explanation)
+                cache.put(cache_key, explanation)
+        except Exception as e:
+            print(f"Error explaining machines for model '{key}': {e}")
+            for position in positions:
+                results[position]["riskOfFailure"] = f"Error: {e}"
+    return results
@@ -1,9 +1,19 @@
+import threading
+import time
+from functools import partial
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Any
-from src.data import create_hourly_error_counts, preprocess_data
-from app.model_loader import get_model, get_model_features
+from typing import List, Dict, Any, Callable
+from src.data import create_hourly_error_counts, preprocess_data, add_maintenance_features
+from app.model_loader import get_model, get_model_features, get_maintenance_index, get_cascade, get_model_registry, get_model_key, get_component_models
 from app.schemas import MachineDataInput
+from app.telemetry_store import TelemetryStore
+from app.drift_monitor import get_drift_monitor
+
+# Running counters for cascade mode, reported through get_cascade_stats().
+CASCADE_STATS = {'screened': 0, 'short_circuited': 0}
+_CASCADE_STATS_LOCK = threading.Lock()
 
 def prepare_dataframe_from_json(machine_data: MachineDataInput) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
@@ -28,21 +38,16 @@ def prepare_dataframe_from_json(machine_data: MachineDataInput) -> tuple[pd.Data
     return df_telemetry, df_errors
 
 
-def run_inference_for_machine(machine_data_input: MachineDataInput) -> Dict[str, Any]:
+def build_features(df_telemetry: pd.DataFrame, df_errors: pd.DataFrame, model_features: List[str] | None = None) -> tuple[pd.DataFrame | None, str | None]:
     """
-    Runs preprocessing and inference for a single machine's data.
+    Runs preprocessing for a single machine's telemetry and errors and returns its latest
+    feature row, aligned to the model features. If no row can be built, returns (None, reason).
     """
-    model = get_model()
-    model_features = get_model_features()
-
-    df_telemetry, df_errors = prepare_dataframe_from_json(machine_data_input)
+    if model_features is None:
+        model_features = get_model_features()
 
     if df_telemetry.empty:
-        return {
-            "machineId": machine_data_input.machineId,
-            "predictionDate": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "riskOfFailure": "N/A (No telemetry data)"
-        }
+        return None, "N/A (No telemetry data)"
 
     if not df_errors.empty:
         hourly_error_counts = create_hourly_error_counts(df_errors)
@@ -52,14 +57,14 @@ def run_inference_for_machine(machine_data_input: MachineDataInput) -> Dict[str,
     df_processed = preprocess_data(df_telemetry, hourly_error_counts, is_train=False)
 
     if df_processed.empty:
-        return {
-            "machineId": machine_data_input.machineId,
-            "predictionDate": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "riskOfFailure": "N/A (Preprocessing failed or no data)"
-        }
+        return None, "N/A (Preprocessing failed or no data)"
 
     latest_data_point = df_processed.sort_values(by='datetime', ascending=False).iloc[[0]]
 
+    maintenance_index = get_maintenance_index()
+    if maintenance_index is not None:
+        latest_data_point = add_maintenance_features(latest_data_point.copy(), maintenance_index)
+
     X_predict = pd.DataFrame(columns=model_features)
     for col in model_features:
         if col in latest_data_point.columns:
@@ -67,9 +72,89 @@ def run_inference_for_machine(machine_data_input: MachineDataInput) -> Dict[str,
         else:
             X_predict[col] = 0 
 
-    X_predict = X_predict[model_features]
+    return X_predict[model_features], None
+
+
+def build_features_for_machine(machine_data_input: MachineDataInput, model_features: List[str] | None = None) -> tuple[pd.DataFrame | None, str | None]:
+    """
+    Builds the latest feature row for a single machine's JSON input. See build_features.
+    """
+    df_telemetry, df_errors = prepare_dataframe_from_json(machine_data_input)
+    return build_features(df_telemetry, df_errors, model_features)
+
+
+def _record_cascade_stats(screened: int, short_circuited: int) -> None:
+    with _CASCADE_STATS_LOCK:
+        CASCADE_STATS['screened'] += screened
+        CASCADE_STATS['short_circuited'] += short_circuited
+
+
+def get_cascade_stats() -> Dict[str, Any]:
+    """Returns how many machines the cascade screened and how many it short-circuited."""
+    with _CASCADE_STATS_LOCK:
+        screened = CASCADE_STATS['screened']
+        short_circuited = CASCADE_STATS['short_circuited']
+    cascade = get_cascade()
+    return {
+        "enabled": cascade is not None,
+        "screened": screened,
+        "shortCircuited": short_circuited,
+        "shortCircuitRate": short_circuited / screened if screened else 0.0,
+        "validationShortCircuitRate": cascade['validation_short_circuit_rate'] if cascade else None
+    }
+
+
+def score_features(X_predict: pd.DataFrame, model=None) -> np.ndarray:
+    """
+    Returns the failure probability for each row of X_predict in one vectorized call.
 
-    probability_failure = model.predict_proba(X_predict)[:, 1][0] # Probability of class '1' (failure)
+    `model` defaults to the main model. In cascade mode, the main model first scores every
+    row with its first `screen_trees` trees. Only rows at or above the screening threshold
+    are rescored with the full model; the rest keep their screening score. Routed models
+    are not calibrated for the cascade and always use all their trees.
+    """
+    if model is not None and model is not get_model():
+        return model.predict_proba(X_predict)[:, 1]
+
+    model = get_model()
+    cascade = get_cascade()
+
+    if cascade is None:
+        return model.predict_proba(X_predict)[:, 1] # Probability of class '1' (failure)
+
+    probabilities = model.predict_proba(X_predict, iteration_range=(0, cascade['screen_trees']))[:, 1]
+    escalate = probabilities >= cascade['screen_threshold']
+    if escalate.any():
+        probabilities[escalate] = model.predict_proba(X_predict[escalate])[:, 1]
+    _record_cascade_stats(len(X_predict), int((~escalate).sum()))
+    return probabilities
+
+
+def score_components(X_predict: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Returns {component: failure probabilities} for every row of X_predict, one vectorized
+    call per component model on the shared feature rows.
+    """
+    return {
+        comp: model.predict_proba(X_predict[model.feature_names_in_])[:, 1]
+        for comp, model in get_component_models().items()
+    }
+
+
+def run_inference_for_machine(machine_data_input: MachineDataInput) -> Dict[str, Any]:
+    """
+    Runs preprocessing and inference for a single machine's data.
+    """
+    X_predict, reason = build_features_for_machine(machine_data_input)
+
+    if X_predict is None:
+        return {
+            "machineId": machine_data_input.machineId,
+            "predictionDate": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "riskOfFailure": reason
+        }
+
+    probability_failure = score_features(X_predict)[0]
     risk_percentage = f"{probability_failure * 100:.1f}%"
 
     return {
@@ -78,20 +163,103 @@ def run_inference_for_machine(machine_data_input: MachineDataInput) -> Dict[str,
         "riskOfFailure": risk_percentage
     }
 
-def batch_predict(batch_input: List[MachineDataInput]) -> List[Dict[str, Any]]:
+def predict_machines(machine_frames: List[tuple[int, Callable[[], tuple[pd.DataFrame, pd.DataFrame]]]], deadline: float | None = None) -> List[Dict[str, Any]]:
     """
-    Processes a batch of machine data inputs and returns predictions.
+    Scores a list of (machineId, load_frames) pairs, where load_frames returns the machine's
+    telemetry and error DataFrames, and returns predictions in the same order.
+
+    If a time.monotonic() `deadline` is given, it is checked before each machine; machines
+    not reached in time are returned marked as timed out instead of being processed.
+
+    Machines are grouped by the model that serves them (see app.model_loader.ModelRegistry),
+    features are built per machine, and each model scores its whole group in a single call.
     """
+    registry = get_model_registry()
+    drift_monitor = get_drift_monitor()
     results = []
-    for machine_data in batch_input:
-        try:
-            prediction = run_inference_for_machine(machine_data)
-            results.append(prediction)
-        except Exception as e:
-            print(f"Error processing machine {machine_data.machineId}: {e}")
+    groups = {} # model key -> (result positions, feature rows)
+    telemetry_frames = []
+    for machine_id, load_frames in machine_frames:
+        if deadline is not None and time.monotonic() >= deadline:
             results.append({
-                "machineId": machine_data.machineId,
+                "machineId": machine_id,
                 "predictionDate": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "riskOfFailure": f"Error: {e}"
+                "riskOfFailure": "N/A (Timed out)",
+                "timedOut": True
             })
-    return results
\ No newline at end of file
+            continue
+
+        key = registry.resolve(get_model_key(machine_id))
+        try:
+            _, model_features = registry.get(key)
+            df_telemetry, df_errors = load_frames()
+            if drift_monitor is not None:
+                telemetry_frames.append(df_telemetry)
+            X_predict, reason = build_features(df_telemetry, df_errors, model_features)
+        except Exception as e:
+            print(f"Error processing machine {machine_id}: {e}")
+            X_predict, reason = None, f"Error: {e}"
+
+        results.append({
+            "machineId": machine_id,
+            "predictionDate": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "riskOfFailure": reason
+        })
+        if X_predict is not None:
+            positions, feature_rows = groups.setdefault(key, ([], []))
+            positions.append(len(results) - 1)
+            feature_rows.append(X_predict)
+
+    scored_features = []
+    for key, (positions, feature_rows) in groups.items():
+        try:
+            model, _ = registry.get(key)
+            X_group = pd.concat(feature_rows, ignore_index=True)
+            scored_features.append(X_group)
+            probabilities = score_features(X_group, model)
+            try:
+                component_probabilities = score_components(X_group)
+            except Exception as e:
+                # Component risks are supplementary: keep the overall risk and omit them.
+                print(f"Error scoring component models for model '{key}': {e}")
+                component_probabilities = None
+            for i, (position, probability_failure) in enumerate(zip(positions, probabilities)):
+                results[position]["riskOfFailure"] = f"{probability_failure * 100:.1f}%"
+                if component_probabilities:
+                    results[position]["componentRisks"] = {
+                        comp: f"{probs[i] * 100:.1f}%" for comp, probs in component_probabilities.items()
+                    }
+        except Exception as e:
+            print(f"Error scoring machines for model '{key}': {e}")
+            for position in positions:
+                results[position]["riskOfFailure"] = f"Error: {e}"
+
+    if drift_monitor is not None:
+        try:
+            drift_monitor.update(
+                pd.concat(telemetry_frames, ignore_index=True) if telemetry_frames else None,
+                pd.concat(scored_features, ignore_index=True) if scored_features else None
+            )
+        except Exception as e:
+            print(f"Error updating drift monitor: {e}")
+    return results
+
+def batch_predict(batch_input: List[MachineDataInput], deadline: float | None = None) -> List[Dict[str, Any]]:
+    """
+    Processes a batch of machine data inputs and returns predictions.
+    """
+    return predict_machines([
+        (machine_data.machineId, partial(prepare_dataframe_from_json, machine_data))
+        for machine_data in batch_input
+    ], deadline)
+
+def batch_predict_from_store(machine_ids: List[int], store: TelemetryStore, deadline: float | None = None) -> List[Dict[str, Any]]:
+    """
+    Fetches the trailing 24h window of each machine from the telemetry store in one
+    query per table, then scores them like batch_predict.
+    """
+    windows = store.fetch_windows(machine_ids)
+    return predict_machines([
+        (machine_id, partial(windows.__getitem__, machine_id))
+        for machine_id in machine_ids
+    ], deadline)
@@ -0,0 +1,223 @@
+import json
+import os
+import sys
+import time
+import uuid
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict
+from app.settings import BASE_DIR, get_config # Model-free, so spawned workers don't load every model
+
+logger = logging.getLogger(__name__)
+
+SRC_DIR = BASE_DIR / 'src'
+STATUS_FILE = 'status.json'
+
+# Global variable to cache the job manager, like the model in app.model_loader.
+MANAGER = None
+
+
+class JobRejected(Exception):
+    """Raised when a job cannot be accepted (bad input path or full queue)."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _write_status(job_dir, **fields):
+    """Merges `fields` into the job's status file, replacing it atomically."""
+    status_path = os.path.join(job_dir, STATUS_FILE)
+    try:
+        with open(status_path, 'r') as f:
+            status = json.load(f)
+    except FileNotFoundError:
+        status = {}
+    status.update(fields, updatedAt=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    tmp_path = f"{status_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, indent=4)
+    os.replace(tmp_path, status_path)
+
+
+def _init_worker(niceness):
+    """Worker process initializer: runs once per pool process, not per job."""
+    # Lower the worker's priority so bulk jobs yield the CPU to interactive requests.
+    # os.nice is relative, so calling it per job would keep lowering the priority.
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+
+
+def _run_job(job_dir, config, telemetry_path, errors_path, chunk_machines):
+    """Worker process entry point: runs the batch prediction pipeline on one job's input."""
+    # The batch scripts in src/ import their siblings by bare module name.
+    if str(SRC_DIR) not in sys.path:
+        sys.path.insert(0, str(SRC_DIR))
+    from predict import predict_in_chunks
+
+    started = time.monotonic()
+    _write_status(job_dir, status='running', startedAt=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+    def report_progress(rows_done, rows_total, machines_done, machines_total):
+        elapsed = time.monotonic() - started
+        _write_status(
+            job_dir,
+            rowsProcessed=rows_done, rowsTotal=rows_total,
+            machinesProcessed=machines_done, machinesTotal=machines_total,
+            progress=rows_done / rows_total if rows_total else 1.0,
+            rowsPerSecond=rows_done / elapsed if elapsed > 0 else None
+        )
+
+    output_path = os.path.join(job_dir, 'predictions')
+    try:
+        predict_in_chunks(config, telemetry_path, errors_path, output_path, chunk_machines, report_progress)
+        _write_status(job_dir, status='completed', output=output_path, elapsedSeconds=time.monotonic() - started)
+    except Exception as e:
+        _write_status(job_dir, status='failed', error=str(e), elapsedSeconds=time.monotonic() - started)
+        raise
+
+
+class JobManager:
+    """Runs bulk scoring jobs in a bounded pool of worker processes.
+
+    Jobs run in separate, lower-priority processes so they do not compete with
+    interactive predict calls for the API process's GIL. Their status lives in
+    `<jobs_dir>/<job id>/status.json`, written by the worker as chunks complete.
+    """
+
+    def __init__(self, jobs_dir, allowed_dirs, max_workers=1, max_pending_jobs=10, chunk_machines=100, niceness=10):
+        self.jobs_dir = Path(jobs_dir)
+        self.allowed_dirs = [Path(d).resolve() for d in allowed_dirs]
+        self.max_pending_jobs = max_pending_jobs
+        self.chunk_machines = chunk_machines
+        self.niceness = niceness
+        self.max_workers = max_workers
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def _new_executor(self):
+        # 'spawn' avoids forking a process that runs server threads.
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self.niceness,)
+        )
+
+    def _replace_if_broken(self, executor):
+        """Replaces `executor` if it is still the current one and a worker died, breaking the pool for good."""
+        with self._lock:
+            if executor is self._executor and getattr(executor, '_broken', False):
+                logger.warning("Job worker pool is broken (a worker died). Starting a new pool.")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+
+    def _resolve_input(self, path):
+        resolved = (BASE_DIR / path).resolve()
+        if not any(resolved.is_relative_to(allowed) for allowed in self.allowed_dirs):
+            raise JobRejected(403, f"Path '{path}' is outside the allowed input directories.")
+        if not resolved.exists():
+            raise JobRejected(404, f"Path '{path}' does not exist.")
+        return resolved
+
+    def submit(self, input_path: str, errors_path: str | None = None) -> Dict[str, Any]:
+        """Queues a job for a telemetry file, or a directory with PdM_telemetry.csv and PdM_errors.csv."""
+        telemetry_path = self._resolve_input(input_path)
+        if telemetry_path.is_dir():
+            data_dir = telemetry_path
+            telemetry_path = self._resolve_input(data_dir / 'PdM_telemetry.csv')
+            errors_path = errors_path or data_dir / 'PdM_errors.csv'
+        if errors_path is None:
+            raise JobRejected(400, "errorsPath is required when the input is a single telemetry file.")
+        errors_path = self._resolve_input(errors_path)
+
+        with self._lock:
+            if self._pending >= self.max_pending_jobs:
+                raise JobRejected(429, "Too many pending jobs. Try again later.")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.jobs_dir / job_id
+        try:
+            job_dir.mkdir(parents=True)
+        except OSError:
+            with self._lock:
+                self._pending -= 1
+            raise
+        _write_status(
+            str(job_dir), jobId=job_id, status='queued',
+            telemetryPath=str(telemetry_path), errorsPath=str(errors_path),
+            submittedAt=time.strftime('%Y-%m-%dT%H:%M:%S')
+        )
+
+        # A worker that died (e.g. out of memory) leaves the pool unusable; start a new one first.
+        self._replace_if_broken(self._executor)
+        executor = self._executor
+        try:
+            future = executor.submit(
+                _run_job, str(job_dir), _absolute_config(get_config()),
+                str(telemetry_path), str(errors_path), self.chunk_machines
+            )
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+            _write_status(str(job_dir), status='failed', error=f"Job could not be started: {e}")
+            if isinstance(e, BrokenProcessPool):
+                self._replace_if_broken(executor)
+            logger.error(f"Job {job_id} could not be started: {e}")
+            raise JobRejected(503, f"Job could not be started: {e}. Try again.")
+        future.add_done_callback(lambda f: self._on_done(job_id, str(job_dir), executor, f))
+        logger.info(f"Job {job_id} queued for {telemetry_path}")
+        return self.get(job_id)
+
+    def _on_done(self, job_id, job_dir, executor, future):
+        with self._lock:
+            self._pending -= 1
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Job {job_id} failed: {error}")
+            if isinstance(error, BrokenProcessPool):
+                self._replace_if_broken(executor)
+            # The worker may have died before writing its own status.
+            if self.get(job_id).get('status') != 'failed':
+                _write_status(job_dir, status='failed', error=str(error))
+        else:
+            logger.info(f"Job {job_id} completed.")
+
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        """Returns the status of a job, or None if it does not exist."""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self.jobs_dir / job_id / STATUS_FILE, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+def _absolute_config(config):
+    """Returns a copy of the config with relative paths resolved against the project root."""
+    paths = {key: str(BASE_DIR / value) for key, value in config['paths'].items()}
+    return {**config, 'paths': paths}
+
+
+def get_job_manager():
+    """Returns the job manager configured in config.yaml, creating it on first use."""
+    global MANAGER
+    if MANAGER is None:
+        config = get_config()
+        jobs_cfg = config.get('jobs', {})
+        MANAGER = JobManager(
+            BASE_DIR / config['paths']['jobs_dir'],
+            [BASE_DIR / d for d in jobs_cfg.get('allowed_input_dirs', ['data'])],
+            max_workers=jobs_cfg.get('max_workers', 1),
+            max_pending_jobs=jobs_cfg.get('max_pending_jobs', 10),
+            chunk_machines=jobs_cfg.get('chunk_machines', 100),
+            niceness=jobs_cfg.get('niceness', 10)
+        )
+    return MANAGER
@@ -1,39 +1,41 @@
 import joblib
-import yaml
+import json
 import os
 import logging
-from pathlib import Path
+import threading
+from collections import OrderedDict
+from app.settings import BASE_DIR, load_config as load_app_config
+from src.data import COMPONENTS, build_maintenance_index, update_maintenance_index, load_machine_data, save_maintenance_index
+from src.model import compute_model_version, component_path
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-BASE_DIR = Path(__file__).resolve().parent.parent 
-
 # Global variables to cache the loaded model, config, and its features.
 MODEL = None
 CONFIG = None
 MODEL_FEATURES = None
+MODEL_VERSION = None
+COMPONENT_MODELS = None
+MAINTENANCE_INDEX = None
+CASCADE = None
+REGISTRY = None
+# Bumped whenever the maintenance index is refreshed, so cached results built on the old one are not reused.
+MAINTENANCE_VERSION = 0
+MAINTENANCE_LOCK = threading.Lock()
+
+DEFAULT_MODEL_KEY = 'default'
 
 def load_config(config_path=BASE_DIR / "config.yaml"):
     """Loads the YAML configuration file into the global CONFIG variable."""
     global CONFIG
-    # Load only if it hasn't been loaded yet (singleton pattern).
     if CONFIG is None:
-        try:
-            with open(config_path, 'r') as f:
-                CONFIG = yaml.safe_load(f)
-            logger.info(f"Configuration loaded successfully from {config_path}")
-        except FileNotFoundError:
-            logger.error(f"Configuration file not found at: {config_path}")
-            raise
-        except Exception as e:
-            logger.error(f"Error loading configuration file: {e}")
-            raise
+        CONFIG = load_app_config(config_path)
     return CONFIG
 
 def load_prediction_model():
     """Loads the trained prediction model and its features into global variables."""
-    global MODEL, CONFIG, MODEL_FEATURES
+    global MODEL, CONFIG, MODEL_FEATURES, MODEL_VERSION
     # Load only if the model hasn't been loaded yet.
     if MODEL is None:
         # Ensure config is loaded first to get the model path.
@@ -48,6 +50,7 @@ def load_prediction_model():
             MODEL = joblib.load(model_path)
             # Store the feature names expected by the model for later validation/use.
             MODEL_FEATURES = MODEL.feature_names_in_.tolist() 
+            MODEL_VERSION = compute_model_version(MODEL)
             logger.info(f"Model loaded successfully from {model_path}")
         except FileNotFoundError:
             logger.error(f"Model file not found at: {model_path}")
@@ -57,11 +60,216 @@ def load_prediction_model():
             raise
     return MODEL, MODEL_FEATURES
 
+def load_component_models():
+    """Loads the per-component failure models (comp1-comp4) next to the main model, if they exist."""
+    global COMPONENT_MODELS, CONFIG
+    if COMPONENT_MODELS is None:
+        if CONFIG is None:
+            load_config()
+
+        COMPONENT_MODELS = {}
+        for comp in COMPONENTS:
+            model_path = BASE_DIR / component_path(CONFIG['paths']['model_output'], comp)
+            try:
+                COMPONENT_MODELS[comp] = joblib.load(model_path)
+            except FileNotFoundError:
+                continue
+        if COMPONENT_MODELS:
+            logger.info(f"Component models loaded successfully: {', '.join(COMPONENT_MODELS)}")
+    return COMPONENT_MODELS
+
+def load_maintenance_index():
+    """Loads the maintenance index built at training time into a global variable.
+
+    The index is optional: if it is missing, the maintenance features are simply
+    left empty and the model treats them as missing values.
+    """
+    global MAINTENANCE_INDEX, CONFIG
+    if MAINTENANCE_INDEX is None:
+        if CONFIG is None:
+            load_config()
+
+        index_path_str = CONFIG['paths'].get('maintenance_index')
+        if not index_path_str:
+            return None
+        index_path = BASE_DIR / index_path_str
+
+        try:
+            MAINTENANCE_INDEX = joblib.load(index_path)
+            logger.info(f"Maintenance index loaded successfully from {index_path}")
+        except FileNotFoundError:
+            logger.warning(f"Maintenance index not found at: {index_path}")
+    return MAINTENANCE_INDEX
+
+def _set_maintenance_index(maintenance_index):
+    """Serves a new maintenance index and saves it to paths.maintenance_index for the batch and job paths."""
+    global MAINTENANCE_INDEX, MAINTENANCE_VERSION
+    save_maintenance_index(maintenance_index, str(BASE_DIR / get_config()['paths']['maintenance_index']))
+    MAINTENANCE_INDEX = maintenance_index
+    MAINTENANCE_VERSION += 1
+
+def ingest_maintenance(df_maint, coverage_end=None):
+    """Merges new maintenance events into the served index, without retraining.
+
+    Returns the refreshed index.
+    """
+    with MAINTENANCE_LOCK:
+        current = get_maintenance_index() or {'components': COMPONENTS, 'maintenance': {}, 'machines': {}, 'coverage_end': None}
+        _set_maintenance_index(update_maintenance_index(current, df_maint, coverage_end))
+        logger.info(f"Maintenance index updated with {len(df_maint)} events.")
+        return MAINTENANCE_INDEX
+
+def reload_maintenance_index(coverage_end=None):
+    """Rebuilds the served index from paths.maintenance_machines and paths.maintenance_log.
+
+    Returns the refreshed index.
+    """
+    paths = get_config()['paths']
+    if not paths.get('maintenance_machines') or not paths.get('maintenance_log'):
+        raise ValueError("paths.maintenance_machines and paths.maintenance_log must be configured to reload the maintenance index.")
+    with MAINTENANCE_LOCK:
+        df_machines, df_maint = load_machine_data(BASE_DIR / paths['maintenance_machines'], BASE_DIR / paths['maintenance_log'])
+        _set_maintenance_index(build_maintenance_index(df_machines, df_maint, coverage_end))
+        logger.info(f"Maintenance index rebuilt from {paths['maintenance_log']}.")
+        return MAINTENANCE_INDEX
+
+def load_cascade():
+    """Loads the cascade screening settings calibrated at training time.
+
+    Returns None (full model for every machine) unless cascade mode is enabled
+    in the configuration and the calibration file exists.
+    """
+    global CASCADE, CONFIG
+    if CASCADE is None:
+        if CONFIG is None:
+            load_config()
+
+        if not CONFIG.get('cascade', {}).get('enabled', False):
+            return None
+        cascade_path = BASE_DIR / CONFIG['paths']['cascade_config']
+
+        try:
+            with open(cascade_path, 'r') as f:
+                CASCADE = json.load(f)
+            logger.info(f"Cascade settings loaded successfully from {cascade_path}")
+        except FileNotFoundError:
+            logger.warning(f"Cascade mode enabled but settings not found at: {cascade_path}. Using the full model only.")
+    return CASCADE
+
+class ModelRegistry:
+    """Maps routing keys to model artifacts and keeps recently used models in memory.
+
+    Models are loaded lazily on first use and evicted least-recently-used first
+    once more than `max_models` are loaded or their serialized size exceeds
+    `max_memory_mb`. The default model (paths.model_output) is always resident
+    and does not count against the budget. Concurrent misses on the same key
+    load the artifact only once.
+    """
+
+    def __init__(self, routes, max_models=8, max_memory_mb=None):
+        self.routes = dict(routes or {})
+        self.max_models = max_models
+        self.max_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        self._models = OrderedDict() # key -> (model, features, size in bytes, version)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def resolve(self, key):
+        """Returns the key that will actually serve `key`, falling back to the default model."""
+        return key if key in self.routes else DEFAULT_MODEL_KEY
+
+    def get(self, key):
+        """Returns (model, features) for a routing key, loading the model if needed."""
+        key = self.resolve(key)
+        if key == DEFAULT_MODEL_KEY:
+            return get_model(), get_model_features()
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry[0], entry[1]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given key; the others wait and then hit the cache.
+        with key_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    return entry[0], entry[1]
+
+            model, features, size, version = self._load(key)
+
+            with self._lock:
+                self._models[key] = (model, features, size, version)
+                self._total_bytes += size
+                self._evict()
+        return model, features
+
+    def _load(self, key):
+        model_path = BASE_DIR / self.routes[key]
+        try:
+            model = joblib.load(model_path)
+        except FileNotFoundError:
+            logger.error(f"Model file for '{key}' not found at: {model_path}")
+            raise
+        size = len(model.get_booster().save_raw())
+        logger.info(f"Model '{key}' loaded successfully from {model_path} ({size / 1024:.0f} KiB)")
+        return model, model.feature_names_in_.tolist(), size, compute_model_version(model)
+
+    def _evict(self):
+        # Always keep the most recently loaded model, even if it alone exceeds the budget.
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            key, (_, _, size, _) = self._models.popitem(last=False)
+            self._total_bytes -= size
+            logger.info(f"Model '{key}' evicted from the registry.")
+
+    def get_version(self, key):
+        """Returns the version of the model serving `key`, loading it if needed."""
+        key = self.resolve(key)
+        if key == DEFAULT_MODEL_KEY:
+            return get_model_version()
+        self.get(key)
+        with self._lock:
+            entry = self._models.get(key)
+        # The model may already have been evicted again by a concurrent load.
+        return entry[3] if entry is not None else compute_model_version(self.get(key)[0])
+
+    def loaded_keys(self):
+        """Returns the keys of the models currently in memory, least recently used first."""
+        with self._lock:
+            return list(self._models.keys())
+
+def load_model_registry():
+    """Creates the model registry from the 'model_registry' configuration section."""
+    global REGISTRY, CONFIG
+    if REGISTRY is None:
+        if CONFIG is None:
+            load_config()
+
+        registry_cfg = CONFIG.get('model_registry') or {}
+        REGISTRY = ModelRegistry(
+            registry_cfg.get('routes'),
+            max_models=registry_cfg.get('max_models', 8),
+            max_memory_mb=registry_cfg.get('max_memory_mb')
+        )
+        logger.info(f"Model registry created with {len(REGISTRY.routes)} routes.")
+    return REGISTRY
+
 # --- Eager Loading ---
 # Load configuration and model when this module is first imported.
 # This prevents loading delays on the first API request (e.g., in a FastAPI startup event).
 load_config()
 load_prediction_model()
+load_component_models()
+load_maintenance_index()
+load_cascade()
+load_model_registry()
 
 # --- Accessor Functions ---
 # Provide a controlled way to access the global variables,
@@ -79,6 +287,53 @@ def get_model_features():
         load_prediction_model()
     return MODEL_FEATURES
 
+def get_component_models():
+    """Returns {component: model} for the loaded per-component models (may be empty)."""
+    if COMPONENT_MODELS is None:
+        load_component_models()
+    return COMPONENT_MODELS
+
+def get_model_version():
+    """Returns the version hash of the loaded model."""
+    if MODEL_VERSION is None:
+        load_prediction_model()
+    return MODEL_VERSION
+
+def get_maintenance_index():
+    """Returns the loaded maintenance index, or None if it is not available."""
+    if MAINTENANCE_INDEX is None:
+        load_maintenance_index()
+    return MAINTENANCE_INDEX
+
+def get_maintenance_version():
+    """Returns a counter that changes whenever the maintenance index is refreshed."""
+    return MAINTENANCE_VERSION
+
+def get_cascade():
+    """Returns the cascade settings, or None if cascade mode is off."""
+    if CASCADE is None:
+        load_cascade()
+    return CASCADE
+
+def get_model_registry():
+    """Returns the model registry."""
+    if REGISTRY is None:
+        load_model_registry()
+    return REGISTRY
+
+def get_model_key(machine_id):
+    """Returns the routing key for a machine: its machine model type (e.g. 'model3').
+
+    Machines unknown to the maintenance index are routed to the default model.
+    """
+    maintenance_index = get_maintenance_index()
+    if maintenance_index is None:
+        return DEFAULT_MODEL_KEY
+    metadata = maintenance_index['machines'].get(int(machine_id))
+    if metadata is None:
+        return DEFAULT_MODEL_KEY
+    return f"model{metadata['model']}"
+
 def get_config():
     """Returns the loaded configuration."""
     if CONFIG is None:
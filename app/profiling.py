@@ -0,0 +1,125 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List
+from app.model_loader import BASE_DIR, get_config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+ADMIN_TOKEN_ENV = 'PDM_ADMIN_TOKEN'
+SORT_KEYS = sorted(pstats.Stats.sort_arg_dict_default) # Accepted by summarize(sort_by=...), including abbreviations.
+
+# Global variable to cache the profiler, like the model in app.model_loader.
+PROFILER = None
+
+
+class RequestProfiler:
+    """Captures cProfile profiles of inference calls into a bounded on-disk ring.
+
+    A call is profiled when it carries the admin token in the X-Profile-Token
+    header, or at random with probability `sample_rate`. Otherwise the only cost
+    is a token check and, if sampling is on, one random draw.
+    """
+
+    def __init__(self, profile_dir, admin_token=None, sample_rate=0.0, max_profiles=50):
+        self.profile_dir = profile_dir
+        self.admin_token = admin_token or None
+        self.sample_rate = sample_rate
+        self._profiles = deque() # metadata of saved profiles, oldest first
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._profiling_lock = threading.Lock() # cProfile supports one active profiler at a time.
+        os.makedirs(profile_dir, exist_ok=True)
+        # Pick up profiles saved before a restart so the ring stays bounded on disk.
+        for name in sorted(os.listdir(profile_dir)):
+            if name.endswith('.prof'):
+                self._profiles.append({'id': name[:-len('.prof')], 'label': None, 'durationMs': None})
+        self._trim()
+
+    def is_admin(self, token):
+        """Returns True if `token` matches the configured admin token."""
+        return self.admin_token is not None and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def run(self, label: str, func: Callable[..., Any], *args, token: str | None = None) -> Any:
+        """Calls func(*args), profiling the call if requested by token or picked by sampling."""
+        if not (self.is_admin(token) or (self.sample_rate > 0 and random.random() < self.sample_rate)):
+            return func(*args)
+        if not self._profiling_lock.acquire(blocking=False):
+            return func(*args)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            return profiler.runcall(func, *args)
+        finally:
+            self._profiling_lock.release()
+            self._save(label, profiler, time.perf_counter() - start)
+
+    def _save(self, label, profiler, duration):
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        try:
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{profile_id}.prof"))
+        except Exception as e:
+            logger.error(f"Error saving profile {profile_id}: {e}")
+            return
+
+        with self._lock:
+            self._profiles.append({'id': profile_id, 'label': label, 'durationMs': duration * 1000})
+            self._trim()
+        logger.info(f"Saved profile {profile_id} of '{label}' ({duration * 1000:.1f} ms)")
+
+    def _trim(self):
+        while len(self._profiles) > self.max_profiles:
+            oldest = self._profiles.popleft()
+            try:
+                os.remove(self._path(oldest['id']))
+            except FileNotFoundError:
+                pass
+
+    def _path(self, profile_id):
+        return os.path.join(self.profile_dir, f"{profile_id}.prof")
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Returns the metadata of the saved profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get_profile_path(self, profile_id) -> str | None:
+        """Returns the path of a saved profile, or None if it is not in the ring."""
+        with self._lock:
+            if any(p['id'] == profile_id for p in self._profiles):
+                return self._path(profile_id)
+        return None
+
+    def summarize(self, profile_id, sort_by='cumulative', limit=40) -> str | None:
+        """Returns a pstats text report of a saved profile."""
+        path = self.get_profile_path(profile_id)
+        if path is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats(sort_by).print_stats(limit)
+        return output.getvalue()
+
+
+def get_request_profiler():
+    """Returns the request profiler configured in config.yaml, creating it on first use."""
+    global PROFILER
+    if PROFILER is None:
+        config = get_config()
+        profiling_cfg = config.get('profiling', {})
+        PROFILER = RequestProfiler(
+            BASE_DIR / config['paths']['profiles_dir'],
+            admin_token=os.environ.get(ADMIN_TOKEN_ENV) or profiling_cfg.get('admin_token'),
+            sample_rate=profiling_cfg.get('sample_rate', 0.0),
+            max_profiles=profiling_cfg.get('max_profiles', 50)
+        )
+    return PROFILER
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, RootModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 class TelemetryRecord(BaseModel):
@@ -26,16 +26,58 @@ class MachineDataInput(BaseModel):
         # Enables assignment using field names in addition to aliases.
         allow_population_by_field_name = True
 
+class MaintenanceRecord(BaseModel):
+    datetime: datetime
+    machineID: int
+    comp: str
+
+# Defines new maintenance events; coverageEnd declares the log complete up to that time.
+class MaintenanceInput(BaseModel):
+    records: List[MaintenanceRecord]
+    coverageEnd: Optional[datetime] = None
+
+# Defines the state of the maintenance index after a refresh.
+class MaintenanceIndexResponse(BaseModel):
+    machines: int
+    events: int
+    coverageEnd: Optional[str] = None
+
 # Defines the overall input structure, which is a list of machine data.
 class PredictionInput(RootModel[List[MachineDataInput]]):
     root: List[MachineDataInput]
 
+# Defines the input for predictions from the server-side telemetry store: only machine IDs.
+class MachineIdsInput(BaseModel):
+    machineIDs: List[int]
+
+# Defines the response of the bulk ingest endpoints.
+class IngestResponse(BaseModel):
+    ingested: int
+
+# Defines the input of a bulk scoring job: a server-local telemetry file or data directory.
+class JobInput(BaseModel):
+    inputPath: str
+    errorsPath: Optional[str] = None
+
 # Defines the structure for a single prediction output record.
 class PredictionOutputRecord(BaseModel):
     machineId: int
     predictionDate: str
     riskOfFailure: str
+    # Risk per failed component (comp1-comp4), when component models are available.
+    componentRisks: Optional[Dict[str, str]] = None
+    # Set when the request deadline passed before this machine was processed.
+    timedOut: Optional[bool] = None
+
+# Defines a prediction with per-feature contributions (log-odds, tree-SHAP) for high-risk machines.
+class ExplanationOutputRecord(PredictionOutputRecord):
+    contributions: Optional[Dict[str, float]] = None
+    bias: Optional[float] = None
 
 # Defines the overall output structure, which is a list of prediction records.
 class PredictionResponse(RootModel[List[PredictionOutputRecord]]):
-    root: List[PredictionOutputRecord]
\ No newline at end of file
+    root: List[PredictionOutputRecord]
+
+# Defines the overall explanation output structure, which is a list of explanation records.
+class ExplanationResponse(RootModel[List[ExplanationOutputRecord]]):
+    root: List[ExplanationOutputRecord]
@@ -0,0 +1,34 @@
+import yaml
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Global variable to cache the loaded config. Kept apart from app.model_loader so
+# processes that only need settings (e.g. the shard router) do not load any model.
+CONFIG = None
+
+def load_config(config_path=BASE_DIR / "config.yaml"):
+    """Loads the YAML configuration file into the global CONFIG variable."""
+    global CONFIG
+    # Load only if it hasn't been loaded yet (singleton pattern).
+    if CONFIG is None:
+        try:
+            with open(config_path, 'r') as f:
+                CONFIG = yaml.safe_load(f)
+            logger.info(f"Configuration loaded successfully from {config_path}")
+        except FileNotFoundError:
+            logger.error(f"Configuration file not found at: {config_path}")
+            raise
+        except Exception as e:
+            logger.error(f"Error loading configuration file: {e}")
+            raise
+    return CONFIG
+
+def get_config():
+    """Returns the loaded configuration."""
+    if CONFIG is None:
+        load_config()
+    return CONFIG
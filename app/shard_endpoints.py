@@ -0,0 +1,125 @@
+from fastapi import APIRouter, HTTPException, Body, Request
+from typing import List, Dict, Any
+import logging
+from app.schemas import PredictionInput, PredictionOutputRecord, PredictionResponse, MachineIdsInput, IngestResponse, TelemetryRecord, ErrorRecord
+from app.sharding import get_shard_router, ShardRequestFailed, FORWARDED_HEADERS
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+PREDICT_PATH = "/api/v1/predict"
+PREDICT_STORED_PATH = "/api/v1/predict/stored"
+TELEMETRY_PATH = "/api/v1/telemetry"
+ERRORS_PATH = "/api/v1/errors"
+
+
+def _forwarded_headers(request: Request) -> Dict[str, str]:
+    """Returns the deadline and profiling headers to pass on to the backends."""
+    return {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+
+
+@router.post("/predict",
+             response_model=PredictionResponse,
+             summary="Predict Failure Risk (Sharded)",
+             description="Same contract as the backend /predict. Machines are routed to backends by a consistent hash of their machineID, sub-batches are sent concurrently and the predictions are returned in request order.",
+             tags=["Predictions"])
+async def predict_failure_risk(request: Request, payload: PredictionInput = Body(...)):
+    """
+    Endpoint to predict failure risk across the shard backends.
+    """
+    logger.info(f"Routing prediction request for {len(payload.root)} machines.")
+    if not payload.root:
+        raise HTTPException(status_code=400, detail="Request body cannot be empty.")
+
+    try:
+        machines = [machine.model_dump(mode='json', by_alias=True) for machine in payload.root]
+        predictions_raw = await get_shard_router().predict(
+            PREDICT_PATH, machines, lambda machine: machine['machineID'], _forwarded_headers(request)
+        )
+        return PredictionResponse(root=[PredictionOutputRecord(**p) for p in predictions_raw])
+
+    except ShardRequestFailed as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error during sharded prediction: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/predict/stored",
+             response_model=PredictionResponse,
+             summary="Predict Failure Risk from Stored Telemetry (Sharded)",
+             description="Same contract as the backend /predict/stored. Each machine is scored by the backend that owns it, which holds its stored telemetry.",
+             tags=["Predictions"])
+async def predict_failure_risk_from_store(request: Request, payload: MachineIdsInput = Body(...)):
+    """
+    Endpoint to predict failure risk from the backends' telemetry stores.
+    """
+    logger.info(f"Routing stored prediction request for {len(payload.machineIDs)} machines.")
+    if not payload.machineIDs:
+        raise HTTPException(status_code=400, detail="machineIDs cannot be empty.")
+
+    try:
+        predictions_raw = await get_shard_router().predict(
+            PREDICT_STORED_PATH, payload.machineIDs, int, _forwarded_headers(request),
+            body=lambda machine_ids: {"machineIDs": machine_ids}
+        )
+        return PredictionResponse(root=[PredictionOutputRecord(**p) for p in predictions_raw])
+
+    except ShardRequestFailed as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error during sharded stored prediction: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/telemetry",
+             response_model=IngestResponse,
+             summary="Ingest Telemetry (Sharded)",
+             description="Routes each telemetry reading to the backend that owns its machine.",
+             tags=["Telemetry Store"])
+async def ingest_telemetry(records: List[TelemetryRecord] = Body(...)):
+    """
+    Endpoint to ingest telemetry readings into the backends' stores.
+    """
+    return await _ingest(TELEMETRY_PATH, records)
+
+
+@router.post("/errors",
+             response_model=IngestResponse,
+             summary="Ingest Errors (Sharded)",
+             description="Routes each error event to the backend that owns its machine.",
+             tags=["Telemetry Store"])
+async def ingest_errors(records: List[ErrorRecord] = Body(...)):
+    """
+    Endpoint to ingest error events into the backends' stores.
+    """
+    return await _ingest(ERRORS_PATH, records)
+
+
+async def _ingest(path: str, records: List[Any]) -> IngestResponse:
+    if not records:
+        return IngestResponse(ingested=0)
+    try:
+        items = [record.model_dump(mode='json') for record in records]
+        ingested = await get_shard_router().ingest(path, items, lambda item: item['machineID'])
+        return IngestResponse(ingested=ingested)
+    except ShardRequestFailed as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error during sharded ingest: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.get("/shards",
+            summary="Shard Backends",
+            description="Lists the backends on the consistent-hash ring, or the backend owning a given machine with ?machineID=.",
+            tags=["Sharding"])
+async def list_shards(machineID: int | None = None):
+    """
+    Endpoint to inspect the shard routing.
+    """
+    shard_router = get_shard_router()
+    if machineID is not None:
+        return {'machineID': machineID, 'backend': shard_router.ring.get_node(machineID)}
+    return shard_router.describe()
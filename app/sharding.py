@@ -0,0 +1,177 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+from typing import Any, Callable, Dict, List
+import httpx
+from app.settings import get_config
+
+logger = logging.getLogger(__name__)
+
+BACKENDS_ENV = 'PDM_SHARD_BACKENDS' # Comma-separated backend URLs, overrides sharding.backends.
+FORWARDED_HEADERS = ['X-Request-Timeout', 'X-Request-Deadline', 'X-Profile-Token']
+
+# Global variable to cache the shard router, like the model in app.model_loader.
+SHARD_ROUTER = None
+
+
+class ShardRequestFailed(Exception):
+    """Raised when a sharded request cannot be served by the backends."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash, identical across processes and restarts (unlike hash())."""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent-hash ring mapping machine IDs to backend nodes.
+
+    Each node is placed at `replicas` points on the ring and a machine belongs to
+    the first node point at or after its hash. Adding or removing a node only
+    moves the machines between that node's points and their predecessors, about
+    1/N of them, while every other machine stays on its node.
+    """
+
+    def __init__(self, nodes: List[str] | None = None, replicas: int = 100):
+        self.replicas = replicas
+        self._points = [] # Sorted hashes of the node points.
+        self._owners = {} # Point hash -> node.
+        for node in nodes or []:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(set(self._owners.values()))
+
+    def add_node(self, node: str) -> None:
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove_node(self, node: str) -> None:
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: n for p, n in self._owners.items() if n != node}
+
+    def get_node(self, machine_id: int) -> str:
+        """Returns the node owning `machine_id`."""
+        if not self._points:
+            raise ValueError("The hash ring has no nodes.")
+        i = bisect.bisect_left(self._points, _hash(str(int(machine_id))))
+        return self._owners[self._points[i % len(self._points)]]
+
+
+class ShardRouter:
+    """Splits requests into per-backend sub-batches by machine ID and merges the responses.
+
+    Sub-batches are sent concurrently through one pooled HTTP client, so the
+    connections to each backend are reused across requests.
+    """
+
+    def __init__(self, backends: List[str], replicas: int = 100, timeout: float = 30.0, max_connections: int = 100):
+        self.ring = HashRing([b.rstrip('/') for b in backends], replicas)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def partition(self, items: List[Any], machine_id: Callable[[Any], int]) -> Dict[str, List[int]]:
+        """Returns {backend: positions of its items in `items`}, keeping request order within each backend."""
+        shards = {}
+        for position, item in enumerate(items):
+            shards.setdefault(self.ring.get_node(machine_id(item)), []).append(position)
+        return shards
+
+    async def scatter(self, path: str, items: List[Any], machine_id: Callable[[Any], int], headers: Dict[str, str] | None = None, body: Callable[[List[Any]], Any] = list) -> List[Dict[str, Any]]:
+        """Posts each backend `body(sub-batch of items)` as JSON, concurrently.
+
+        Returns one dict per backend with its positions and either the decoded
+        `response` or the `status_code`/`error` of the failure.
+        """
+        shards = self.partition(items, machine_id)
+
+        async def send(backend, positions):
+            shard = {'backend': backend, 'positions': positions}
+            try:
+                response = await self.client.post(f"{backend}{path}", json=body([items[p] for p in positions]), headers=headers)
+            except httpx.HTTPError as e:
+                logger.warning(f"Shard {backend} unavailable: {e!r}")
+                return {**shard, 'status_code': 502, 'error': f"Shard {backend} unavailable: {e!r}"}
+            if response.status_code != 200:
+                try:
+                    detail = response.json().get('detail', response.text)
+                except ValueError:
+                    detail = response.text
+                logger.warning(f"Shard {backend} returned {response.status_code}: {detail}")
+                return {**shard, 'status_code': response.status_code, 'error': f"Shard {backend} returned {response.status_code}: {detail}"}
+            return {**shard, 'response': response.json()}
+
+        return await asyncio.gather(*(send(backend, positions) for backend, positions in shards.items()))
+
+    async def predict(self, path: str, items: List[Any], machine_id: Callable[[Any], int], headers: Dict[str, str] | None = None, body: Callable[[List[Any]], Any] = list) -> List[Dict[str, Any]]:
+        """Scatters a prediction request and merges the per-backend predictions back in request order.
+
+        Machines on a failed backend get an error record, like machines that fail
+        inside a single instance, unless every backend failed, in which case
+        ShardRequestFailed carries the first failure's status code.
+        """
+        shards = await self.scatter(path, items, machine_id, headers, body)
+        failed = [shard for shard in shards if 'error' in shard]
+        if failed and len(failed) == len(shards):
+            raise ShardRequestFailed(failed[0]['status_code'], failed[0]['error'])
+
+        results = [None] * len(items)
+        for shard in shards:
+            if 'error' in shard:
+                for p in shard['positions']:
+                    results[p] = {
+                        "machineId": machine_id(items[p]),
+                        "predictionDate": "N/A",
+                        "riskOfFailure": f"Error: {shard['error']}"
+                    }
+            else:
+                for p, record in zip(shard['positions'], shard['response']):
+                    results[p] = record
+        return results
+
+    async def ingest(self, path: str, items: List[Any], machine_id: Callable[[Any], int]) -> int:
+        """Scatters ingest records to the backends owning their machines and returns the total ingested."""
+        shards = await self.scatter(path, items, machine_id)
+        failed = [shard for shard in shards if 'error' in shard]
+        if failed:
+            # Ingest is idempotent (insert or replace), so the client can safely retry the whole batch.
+            raise ShardRequestFailed(failed[0]['status_code'], failed[0]['error'])
+        return sum(shard['response']['ingested'] for shard in shards)
+
+    def describe(self) -> Dict[str, Any]:
+        return {'backends': self.ring.nodes, 'replicas': self.ring.replicas}
+
+
+def get_shard_router():
+    """Returns the shard router configured in config.yaml (or PDM_SHARD_BACKENDS), creating it on first use."""
+    global SHARD_ROUTER
+    if SHARD_ROUTER is None:
+        sharding_cfg = get_config().get('sharding', {})
+        backends = os.environ.get(BACKENDS_ENV)
+        backends = [b.strip() for b in backends.split(',') if b.strip()] if backends else sharding_cfg.get('backends', [])
+        if not backends:
+            raise ValueError(f"No shard backends configured (sharding.backends or {BACKENDS_ENV}).")
+        SHARD_ROUTER = ShardRouter(
+            backends,
+            replicas=sharding_cfg.get('replicas', 100),
+            timeout=sharding_cfg.get('timeout_seconds', 30.0),
+            max_connections=sharding_cfg.get('max_connections', 100)
+        )
+        logger.info(f"Shard router initialized with backends: {SHARD_ROUTER.ring.nodes}")
+    return SHARD_ROUTER
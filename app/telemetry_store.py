@@ -0,0 +1,156 @@
+import sqlite3
+import threading
+import logging
+import pandas as pd
+from typing import List, Dict
+from app.model_loader import BASE_DIR, get_config
+from app.schemas import TelemetryRecord, ErrorRecord
+
+logger = logging.getLogger(__name__)
+
+# Timestamps are stored as 'YYYY-MM-DD HH:MM:SS' text so they sort and compare
+# correctly in SQLite and work with its datetime() function.
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+TELEMETRY_COLUMNS = ['datetime', 'machineID', 'volt', 'rotate', 'pressure', 'vibration']
+ERROR_COLUMNS = ['datetime', 'machineID', 'errorID']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS telemetry (
+    machineID INTEGER NOT NULL,
+    datetime TEXT NOT NULL,
+    volt REAL, rotate REAL, pressure REAL, vibration REAL,
+    PRIMARY KEY (machineID, datetime)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS errors (
+    machineID INTEGER NOT NULL,
+    datetime TEXT NOT NULL,
+    errorID TEXT NOT NULL,
+    PRIMARY KEY (machineID, datetime, errorID)
+) WITHOUT ROWID;
+"""
+
+# Global variable to cache the store, like the model in app.model_loader.
+STORE = None
+
+
+class TelemetryStore:
+    """Embedded SQLite store of recent telemetry and errors, indexed by (machineID, datetime).
+
+    Clients ingest readings in bulk and then only send machine IDs to predict; the
+    trailing window of every requested machine is fetched with one indexed range
+    query per table. On ingest, each machine in the batch drops its rows older than
+    `retention_hours` before its own newest reading, so machines whose clocks or
+    uploads run ahead cannot purge other machines' history.
+    """
+
+    def __init__(self, db_path, retention_hours=168, window_hours=24):
+        self.db_path = str(db_path)
+        self.retention_hours = retention_hours
+        self.window_hours = window_hours
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def ingest_telemetry(self, records: List[TelemetryRecord]) -> int:
+        """Inserts or replaces telemetry readings and applies the retention window."""
+        rows = [
+            (r.machineID, r.datetime.strftime(DATETIME_FORMAT), r.volt, r.rotate, r.pressure, r.vibration)
+            for r in records
+        ]
+        with self._write_lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO telemetry (machineID, datetime, volt, rotate, pressure, vibration) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._apply_retention(conn, {row[0] for row in rows})
+        return len(rows)
+
+    def ingest_errors(self, records: List[ErrorRecord]) -> int:
+        """Inserts error events (duplicates are ignored) and applies the retention window."""
+        rows = [(r.machineID, r.datetime.strftime(DATETIME_FORMAT), r.errorID) for r in records]
+        with self._write_lock, self._connect() as conn:
+            conn.executemany("INSERT OR IGNORE INTO errors (machineID, datetime, errorID) VALUES (?, ?, ?)", rows)
+            self._apply_retention(conn, {row[0] for row in rows})
+        return len(rows)
+
+    def _apply_retention(self, conn, machine_ids):
+        """Prunes the given machines' rows older than `retention_hours` before their newest reading.
+
+        Every query is a range on the (machineID, datetime) primary key, so the
+        cost depends on the machines ingested, not on the size of the tables.
+        """
+        if not machine_ids:
+            return
+        placeholders = ','.join('?' * len(machine_ids))
+        newest = conn.execute(
+            f"""SELECT machineID, MAX(last_datetime) FROM (
+                    SELECT machineID, MAX(datetime) AS last_datetime FROM telemetry WHERE machineID IN ({placeholders}) GROUP BY machineID
+                    UNION ALL
+                    SELECT machineID, MAX(datetime) AS last_datetime FROM errors WHERE machineID IN ({placeholders}) GROUP BY machineID
+                ) GROUP BY machineID""",
+            [*machine_ids, *machine_ids]
+        ).fetchall()
+        window = f'-{self.retention_hours} hours'
+        cutoffs = [(machine_id, last_datetime, window) for machine_id, last_datetime in newest]
+        conn.executemany("DELETE FROM telemetry WHERE machineID = ? AND datetime < datetime(?, ?)", cutoffs)
+        conn.executemany("DELETE FROM errors WHERE machineID = ? AND datetime < datetime(?, ?)", cutoffs)
+
+    def fetch_windows(self, machine_ids: List[int]) -> Dict[int, tuple[pd.DataFrame, pd.DataFrame]]:
+        """Returns {machineID: (df_telemetry, df_errors)} for the trailing window of each machine.
+
+        The window ends at each machine's latest telemetry reading. Machines with no
+        stored telemetry get empty DataFrames.
+        """
+        unique_ids = list(dict.fromkeys(int(machine_id) for machine_id in machine_ids))
+        placeholders = ','.join('?' * len(unique_ids))
+        window = f'-{self.window_hours} hours'
+        latest = f"""
+            SELECT machineID, MAX(datetime) AS last_datetime FROM telemetry
+            WHERE machineID IN ({placeholders}) GROUP BY machineID
+        """
+        with self._connect() as conn:
+            df_telemetry = pd.read_sql_query(
+                f"""SELECT t.datetime, t.machineID, t.volt, t.rotate, t.pressure, t.vibration
+                    FROM telemetry t JOIN ({latest}) m ON t.machineID = m.machineID
+                    WHERE t.datetime > datetime(m.last_datetime, ?) AND t.datetime <= m.last_datetime""",
+                conn, params=[*unique_ids, window]
+            )
+            df_errors = pd.read_sql_query(
+                f"""SELECT e.datetime, e.machineID, e.errorID
+                    FROM errors e JOIN ({latest}) m ON e.machineID = m.machineID
+                    WHERE e.datetime > datetime(m.last_datetime, ?) AND e.datetime <= m.last_datetime""",
+                conn, params=[*unique_ids, window]
+            )
+        df_telemetry['datetime'] = pd.to_datetime(df_telemetry['datetime'])
+        df_errors['datetime'] = pd.to_datetime(df_errors['datetime'])
+
+        telemetry_by_machine = dict(tuple(df_telemetry.groupby('machineID')))
+        errors_by_machine = dict(tuple(df_errors.groupby('machineID')))
+        return {
+            machine_id: (
+                telemetry_by_machine.get(machine_id, df_telemetry.iloc[0:0]).reset_index(drop=True),
+                errors_by_machine.get(machine_id, df_errors.iloc[0:0]).reset_index(drop=True)
+            )
+            for machine_id in unique_ids
+        }
+
+
+def get_telemetry_store():
+    """Returns the telemetry store configured in config.yaml, creating it on first use."""
+    global STORE
+    if STORE is None:
+        config = get_config()
+        store_cfg = config.get('telemetry_store', {})
+        db_path = BASE_DIR / config['paths']['telemetry_store']
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        STORE = TelemetryStore(
+            db_path,
+            retention_hours=store_cfg.get('retention_hours', 168),
+            window_hours=store_cfg.get('window_hours', 24)
+        )
+        logger.info(f"Telemetry store opened at {db_path}")
+    return STORE
@@ -17,6 +17,22 @@ app = FastAPI(
         {
             "name": "Predictions",
             "description": "Endpoints for making failure predictions.",
+        },
+        {
+            "name": "Telemetry Store",
+            "description": "Endpoints for ingesting telemetry and errors into the server-side store.",
+        },
+        {
+            "name": "Maintenance",
+            "description": "Endpoints for refreshing the maintenance index without retraining.",
+        },
+        {
+            "name": "Jobs",
+            "description": "Endpoints for asynchronous bulk scoring jobs.",
+        },
+        {
+            "name": "Admin",
+            "description": "Administrative endpoints, protected by the admin token.",
         }
     ]
 )
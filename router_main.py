@@ -0,0 +1,55 @@
+import logging
+import uvicorn
+from fastapi import FastAPI
+from app.shard_endpoints import router as shard_router
+from app.sharding import get_shard_router
+
+app = FastAPI(
+    title="Predictive Maintenance Shard Router",
+    description="Front end that routes prediction and ingest requests to Predictive Maintenance API backends by machineID.",
+    version="1.0.0",
+    openapi_tags=[
+        {
+            "name": "Predictions",
+            "description": "Endpoints for making failure predictions, routed to the shard backends.",
+        },
+        {
+            "name": "Telemetry Store",
+            "description": "Endpoints for ingesting telemetry and errors into the shard backends' stores.",
+        },
+        {
+            "name": "Sharding",
+            "description": "Endpoints for inspecting the shard routing.",
+        }
+    ]
+)
+
+# --- Startup and Shutdown Event Handlers ---
+@app.on_event("startup")
+async def startup_event():
+    """
+    Creates the shard router, with its pooled backend connections, when the application starts.
+    """
+    logging.info("Router startup: Creating shard router...")
+    get_shard_router()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Closes the pooled backend connections.
+    """
+    await get_shard_router().close()
+
+app.include_router(shard_router, prefix="/api/v1")
+
+# --- Root Endpoint ---
+@app.get("/", tags=["Root"])
+async def read_root():
+    """
+    Provides a simple welcome message and the configured backends.
+    """
+    return {"message": "Predictive Maintenance Shard Router. Go to /docs for API documentation.", **get_shard_router().describe()}
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    uvicorn.run("router_main:app", host="127.0.0.1", port=8000)
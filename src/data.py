@@ -1,4 +1,13 @@
+import numpy as np
 import pandas as pd
+import joblib
+import os
+import logging
+
+COMPONENTS = ['comp1', 'comp2', 'comp3', 'comp4']
+LABEL_PREFIX = 'failure_in_next_'
+TIME_TO_FAILURE_PREFIX = 'hours_to_'
+TELEMETRY_COLS = ['volt', 'rotate', 'pressure', 'vibration']
 
 def load_and_merge_data(telemetry_path, errors_path, failures_path=None):
     """Loads and merges telemetry, errors, and optionally failures data."""
@@ -11,57 +20,276 @@ def load_and_merge_data(telemetry_path, errors_path, failures_path=None):
     else:
         return df_telemetry, df_errors, None
 
+def load_machine_data(machines_path, maint_path):
+    """Loads machine metadata and maintenance history."""
+    df_machines = pd.read_csv(machines_path)
+    df_maint = pd.read_csv(maint_path, parse_dates=['datetime'])
+    return df_machines, df_maint
+
+def build_maintenance_index(df_machines, df_maint, coverage_end=None):
+    """Builds a compact lookup index from machine metadata and maintenance history.
+
+    For each machine the index keeps one sorted datetime64 array of maintenance
+    timestamps per component, plus the machine model and age, so features can be
+    attached later with a binary search instead of a merge. `coverage_end` is the
+    time up to which the maintenance log is known to be complete (default: its
+    last event). It is informational only, reported so stale indexes can be spotted;
+    hours since maintenance keep counting from the last known event, as in training.
+    """
+    maintenance = {}
+    df_maint = df_maint.sort_values(by=['machineID', 'datetime'])
+    for (machine_id, comp), group in df_maint.groupby(['machineID', 'comp'], sort=False):
+        timestamps = group['datetime'].to_numpy(dtype='datetime64[ns]')
+        maintenance.setdefault(int(machine_id), {})[comp] = timestamps
+
+    machines = {}
+    for row in df_machines.itertuples(index=False):
+        machines[int(row.machineID)] = {
+            'model': int(str(row.model).replace('model', '')), # 'model3' -> 3
+            'age': int(row.age)
+        }
+
+    if coverage_end is None and not df_maint.empty:
+        coverage_end = df_maint['datetime'].max()
+    coverage_end = np.datetime64(coverage_end, 'ns') if coverage_end is not None else None
+
+    return {'components': COMPONENTS, 'maintenance': maintenance, 'machines': machines, 'coverage_end': coverage_end}
+
+def update_maintenance_index(maintenance_index, df_maint, coverage_end=None):
+    """Returns a copy of the index with new maintenance events merged in.
+
+    The coverage end moves to the latest of its current value, the newest event
+    and `coverage_end`. The given index is left untouched, so readers holding it
+    are not affected.
+    """
+    maintenance = dict(maintenance_index['maintenance'])
+    for (machine_id, comp), group in df_maint.groupby(['machineID', 'comp'], sort=False):
+        machine_maint = dict(maintenance.get(int(machine_id), {}))
+        timestamps = group['datetime'].to_numpy(dtype='datetime64[ns]')
+        machine_maint[comp] = np.union1d(machine_maint.get(comp, np.array([], dtype='datetime64[ns]')), timestamps)
+        maintenance[int(machine_id)] = machine_maint
+
+    candidates = [maintenance_coverage_end(maintenance_index)]
+    if not df_maint.empty:
+        candidates.append(np.datetime64(df_maint['datetime'].max(), 'ns'))
+    if coverage_end is not None:
+        candidates.append(np.datetime64(coverage_end, 'ns'))
+    candidates = [c for c in candidates if c is not None]
+
+    return {**maintenance_index, 'maintenance': maintenance, 'coverage_end': max(candidates) if candidates else None}
+
+def maintenance_coverage_end(maintenance_index):
+    """Returns the time up to which the index's maintenance log is complete, or None if unknown.
+
+    Indexes saved before the coverage end was recorded fall back to their last event.
+    """
+    if maintenance_index.get('coverage_end') is not None:
+        return maintenance_index['coverage_end']
+    last_events = [timestamps[-1] for machine_maint in maintenance_index['maintenance'].values() for timestamps in machine_maint.values() if len(timestamps)]
+    return max(last_events) if last_events else None
+
+def add_maintenance_features(df_final, maintenance_index):
+    """Adds hours since last maintenance per component, machine model and age.
+
+    Rows with no earlier maintenance for a component, or machines missing from
+    the index, are left as NaN so XGBoost treats them as missing values. Hours are
+    measured from the last known maintenance even past the index's coverage end,
+    so serving sees the same distribution as training; keep the index fresh
+    through the API's maintenance endpoints.
+    """
+    components = maintenance_index['components']
+    maintenance = maintenance_index['maintenance']
+    machines = maintenance_index['machines']
+
+    datetimes = df_final['datetime'].to_numpy(dtype='datetime64[ns]')
+    machine_ids = df_final['machineID'].to_numpy()
+    hours_since = {comp: np.full(len(df_final), np.nan) for comp in components}
+    machine_model = np.full(len(df_final), np.nan)
+    machine_age = np.full(len(df_final), np.nan)
+
+    for machine_id in np.unique(machine_ids):
+        rows = np.flatnonzero(machine_ids == machine_id)
+        row_times = datetimes[rows]
+        machine_maint = maintenance.get(int(machine_id), {})
+        for comp in components:
+            timestamps = machine_maint.get(comp)
+            if timestamps is None or len(timestamps) == 0:
+                continue
+            # Index of the last maintenance at or before each row timestamp.
+            pos = np.searchsorted(timestamps, row_times, side='right') - 1
+            has_prior = pos >= 0
+            elapsed = row_times[has_prior] - timestamps[pos[has_prior]]
+            hours_since[comp][rows[has_prior]] = elapsed / np.timedelta64(1, 'h')
+
+        metadata = machines.get(int(machine_id))
+        if metadata is not None:
+            machine_model[rows] = metadata['model']
+            machine_age[rows] = metadata['age']
+
+    for comp in components:
+        df_final[f'{comp}_hours_since_maint'] = hours_since[comp]
+    df_final['machine_model'] = machine_model
+    df_final['machine_age'] = machine_age
+    return df_final
+
+def save_maintenance_index(maintenance_index, filepath):
+    """Saves the maintenance index to the specified path, replacing any previous file atomically."""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    tmp_path = f"{filepath}.tmp"
+    joblib.dump(maintenance_index, tmp_path)
+    os.replace(tmp_path, filepath)
+    logging.info(f"Maintenance index saved successfully at: {filepath}")
+
+def load_maintenance_index(filepath):
+    """Loads a previously built maintenance index from the specified path."""
+    maintenance_index = joblib.load(filepath)
+    logging.info(f"Maintenance index loaded from: {filepath}")
+    return maintenance_index
+
 def create_hourly_error_counts(df_errors):
     """Creates hourly error counts per machine."""
     hourly_error_counts = df_errors.groupby(['machineID', pd.Grouper(key='datetime', freq='h')]).size().reset_index(name='countErrors')
     return hourly_error_counts
 
-def preprocess_data(df_telemetry, hourly_error_counts, df_failures=None, is_train=True):
-    """Preprocesses data for training and prediction."""
-    df_final = pd.merge(df_telemetry, hourly_error_counts, on=['machineID', 'datetime'], how='left')
-    df_final['countErrors'] = df_final['countErrors'].fillna(0)
-    df_final = df_final.sort_values(by=['machineID', 'datetime'])
-    df_final.set_index('datetime', inplace=True)
+def _rolling_24h(values, machine_ids, datetimes, by_machine, destination, out, stats):
+    """Writes 24h rolling `stats` of one column per machine into rows of the preallocated `out`.
+
+    Only the column being rolled is handed to pandas, already sorted by
+    (machineID, datetime) through `by_machine`; `destination` maps each of those
+    rows to its position in the output, so no copy of the full frame is made.
+    """
+    series = pd.Series(values[by_machine], index=pd.DatetimeIndex(datetimes[by_machine]))
+    rolling = series.groupby(machine_ids[by_machine], sort=False).rolling(window='24h', min_periods=1)
+    for stat, row in stats:
+        out[row, destination] = getattr(rolling, stat)().to_numpy()
+
+def preprocess_data(df_telemetry, hourly_error_counts, df_failures=None, is_train=True, horizons=(24,)):
+    """Preprocesses data for training and prediction.
+
+    Telemetry and rolling features are written straight into a single float
+    block, already sorted by (datetime, machineID), which becomes the final
+    frame without further copies.
+    """
+    machine_ids = df_telemetry['machineID'].to_numpy()
+    datetimes = df_telemetry['datetime'].to_numpy()
 
-    telemetry_cols = ['volt', 'rotate', 'pressure', 'vibration']
-    for col in telemetry_cols:
-        rolling_features = df_final.groupby('machineID')[col].rolling(window='24h', min_periods=1)
-        df_final[f'{col}_24h_mean'] = rolling_features.mean().reset_index(level=0, drop=True)
-        df_final[f'{col}_24h_std'] = rolling_features.std().reset_index(level=0, drop=True)
+    # Error counts aligned to the telemetry rows (a left join on machineID and datetime).
+    error_counts = hourly_error_counts.set_index(['machineID', 'datetime'])['countErrors']
+    count_errors = error_counts.reindex(pd.MultiIndex.from_arrays([machine_ids, datetimes])).to_numpy(dtype=float)
+    count_errors = np.nan_to_num(count_errors, nan=0.0)
 
-    df_final['errors_in_24h'] = df_final.groupby('machineID')['countErrors'].rolling(window='24h', min_periods=1).sum().reset_index(level=0, drop=True)
-    df_final.reset_index(inplace=True)
-    df_final.sort_values(by=['datetime', 'machineID'], inplace=True)
-    df_final = df_final.drop(columns=['countErrors']) # Drop base count after rolling sum
-    df_final = df_final.fillna(0)
+    by_machine = np.lexsort((datetimes, machine_ids))
+    by_time = np.lexsort((machine_ids, datetimes))
+    position = np.empty(len(by_time), dtype=np.intp)
+    position[by_time] = np.arange(len(by_time))
+    destination = position[by_machine]
 
+    feature_cols = [f'{col}_24h_{stat}' for col in TELEMETRY_COLS for stat in ('mean', 'std')] + ['errors_in_24h']
+    float_cols = TELEMETRY_COLS + feature_cols
+    block = np.empty((len(float_cols), len(by_time)))
+    for i, col in enumerate(TELEMETRY_COLS):
+        values = df_telemetry[col].to_numpy(dtype=float)
+        block[i] = values[by_time]
+        mean_row = float_cols.index(f'{col}_24h_mean')
+        _rolling_24h(values, machine_ids, datetimes, by_machine, destination, block, [('mean', mean_row), ('std', mean_row + 1)])
+    _rolling_24h(count_errors, machine_ids, datetimes, by_machine, destination, block, [('sum', len(float_cols) - 1)])
+    np.nan_to_num(block, copy=False, nan=0.0)
+
+    df_final = pd.DataFrame(block.T, columns=float_cols, copy=False)
+    df_final.insert(0, 'datetime', datetimes[by_time])
+    other_cols = [col for col in df_telemetry.columns if col not in TELEMETRY_COLS and col != 'datetime']
+    for i, col in enumerate(other_cols, start=1):
+        df_final.insert(i, col, df_telemetry[col].to_numpy()[by_time])
 
     if is_train:
-        df_next_failure = df_failures[['machineID', 'datetime']].rename(columns={'datetime': 'next_failure_datetime'})
-        df_next_failure.sort_values(by=['next_failure_datetime', 'machineID'], inplace=True)
-        df_final = pd.merge_asof(
-            left=df_final,
-            right=df_next_failure,
-            left_on='datetime',
-            right_on='next_failure_datetime',
-            by='machineID',
-            direction='forward'
-        )
-        time_to_failure = df_final['next_failure_datetime'] - df_final['datetime']
-        df_final['failure_in_next_24h'] = ((time_to_failure.dt.total_seconds() <= (24 * 3600)) & (time_to_failure.dt.total_seconds() > 0)).astype(int)
-        df_final = df_final.drop(columns=['next_failure_datetime'])
-        df_final = df_final.fillna(0) # Fill NaNs again after merge
-        return df_final
-    else:
-        return df_final
+        df_final = add_time_to_failure(df_final, df_failures)
+        df_final = add_horizon_labels(df_final, horizons)
+    return df_final
+
+def label_name(horizon, component=None):
+    """Returns the label column name for a horizon in hours, e.g. 'failure_in_next_24h'."""
+    label = f'{LABEL_PREFIX}{horizon}h'
+    return f'{component}_{label}' if component else label
+
+def _hours_to_next_event(datetimes, machine_ids, df_events):
+    """Hours from each row to the next event strictly after it on the same machine (NaN if none)."""
+    hours_to_event = np.full(len(datetimes), np.nan)
+    for machine_id, group in df_events.groupby('machineID', sort=False):
+        rows = np.flatnonzero(machine_ids == machine_id)
+        if len(rows) == 0:
+            continue
+        event_times = np.sort(group['datetime'].to_numpy(dtype='datetime64[ns]'))
+        row_times = datetimes[rows]
+        pos = np.searchsorted(event_times, row_times, side='right')
+        has_next = pos < len(event_times)
+        elapsed = event_times[pos[has_next]] - row_times[has_next]
+        hours_to_event[rows[has_next]] = elapsed / np.timedelta64(1, 'h')
+    return hours_to_event
 
-def prepare_data_for_training(df_final):
+def add_time_to_failure(df_final, df_failures):
+    """Adds hours to the next failure per row, overall and per failed component.
+
+    This is computed once, so labels for any number of horizons can then be
+    derived with a simple comparison instead of re-running the preprocessing.
+    """
+    datetimes = df_final['datetime'].to_numpy(dtype='datetime64[ns]')
+    machine_ids = df_final['machineID'].to_numpy()
+
+    df_final[f'{TIME_TO_FAILURE_PREFIX}failure'] = _hours_to_next_event(datetimes, machine_ids, df_failures)
+    for comp in COMPONENTS:
+        df_comp_failures = df_failures[df_failures['failure'] == comp]
+        df_final[f'{TIME_TO_FAILURE_PREFIX}{comp}_failure'] = _hours_to_next_event(datetimes, machine_ids, df_comp_failures)
+    return df_final
+
+def add_horizon_labels(df_final, horizons=(24,), components=None):
+    """Derives binary failure labels for each horizon (in hours) from the time-to-failure columns."""
+    for horizon in horizons:
+        df_final[label_name(horizon)] = (df_final[f'{TIME_TO_FAILURE_PREFIX}failure'] <= horizon).astype(int)
+        for comp in components or []:
+            df_final[label_name(horizon, comp)] = (df_final[f'{TIME_TO_FAILURE_PREFIX}{comp}_failure'] <= horizon).astype(int)
+    return df_final
+
+def prepare_data_for_training(df_final, label='failure_in_next_24h'):
     """Prepares data for model training."""
-    features = [col for col in df_final.columns if col not in ['datetime', 'machineID', 'failure_in_next_24h']]
+    features = [
+        col for col in df_final.columns
+        if col not in ['datetime', 'machineID'] and LABEL_PREFIX not in col and not col.startswith(TIME_TO_FAILURE_PREFIX)
+    ]
     X = df_final[features]
-    y = df_final['failure_in_next_24h']
+    y = df_final[label]
     return X, y, features
 
+def downsample_negatives(X_train, y_train, df_train, negative_rate, random_state=42, time_bucket='D'):
+    """Keeps every positive row and a reproducible fraction of the negatives.
+
+    Negatives are sampled within strata of (machineID, `time_bucket` of datetime),
+    keeping at least one row per stratum, so every machine and period stays
+    represented. Returns the sampled X and y with instance weights that undo the
+    sampling: each kept negative weighs (negatives in its stratum / kept), so the
+    weighted class balance, and thus the predicted probabilities, match training
+    on all rows.
+    """
+    y_values = np.asarray(y_train)
+    negative_positions = np.flatnonzero(y_values == 0)
+
+    strata = pd.DataFrame({
+        'machineID': np.asarray(df_train['machineID'])[negative_positions],
+        'bucket': pd.DatetimeIndex(df_train['datetime'].to_numpy()[negative_positions]).floor(time_bucket),
+        'draw': np.random.default_rng(random_state).random(len(negative_positions))
+    })
+    groups = strata.groupby(['machineID', 'bucket'])
+    stratum_size = groups['draw'].transform('size').to_numpy()
+    kept_per_stratum = np.maximum(1, np.round(stratum_size * negative_rate))
+    keep_negative = groups['draw'].rank(method='first').to_numpy() <= kept_per_stratum
+
+    weights = np.ones(len(y_values))
+    weights[negative_positions] = stratum_size / kept_per_stratum
+    keep = y_values == 1
+    keep[negative_positions[keep_negative]] = True
+
+    logging.info(f"Downsampled negatives at rate {negative_rate}: {keep.sum()} of {len(keep)} training rows kept.")
+    return X_train.iloc[keep], y_train.iloc[keep], weights[keep]
+
 def split_data(X, y, df_final, train_size=0.8):
     """Splits data into training and testing sets chronologically."""
     # We need machineID for evaluation, but not for training
@@ -69,7 +297,7 @@ def split_data(X, y, df_final, train_size=0.8):
     split_point = int(len(df_final) * train_size)
     
     X_train = X.iloc[:split_point]
-    X_test_full = df_final.iloc[split_point:].copy() # Keep df_final structure for test
+    X_test_full = df_final.iloc[split_point:] # Keep df_final structure for test (pandas>=3 copy-on-write, so no copy)
     y_train = y.iloc[:split_point]
     y_test = y.iloc[split_point:]
     
@@ -0,0 +1,68 @@
+import numpy as np
+import json
+import os
+import logging
+
+RAW_SENSOR_COLUMNS = ['volt', 'rotate', 'pressure', 'vibration']
+PSI_EPSILON = 1e-4 # Floor for empty bins so the PSI stays finite.
+
+def build_column_profile(values, n_bins=20):
+    """Builds the reference profile of one column: quantile bin edges, bin proportions and range."""
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    finite = values[~missing]
+    if len(finite) == 0:
+        return None
+
+    # Interior edges at the reference quantiles, so each bin holds ~1/n_bins of the training data.
+    edges = np.unique(np.quantile(finite, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    counts = np.bincount(np.searchsorted(edges, finite, side='right'), minlength=len(edges) + 1)
+    return {
+        'edges': edges.tolist(),
+        'proportions': (counts / counts.sum()).tolist(),
+        'min': float(finite.min()),
+        'max': float(finite.max()),
+        'missing_rate': float(missing.mean())
+    }
+
+def build_reference_profile(df_telemetry, X_train, n_bins=20):
+    """Builds the drift reference profile for the raw sensors and the engineered model features."""
+    logging.info("Building drift reference profile...")
+    profile = {'raw': {}, 'features': {}}
+    for col in RAW_SENSOR_COLUMNS:
+        column_profile = build_column_profile(df_telemetry[col], n_bins)
+        if column_profile is not None:
+            profile['raw'][col] = column_profile
+    for col in X_train.columns:
+        column_profile = build_column_profile(X_train[col], n_bins)
+        if column_profile is not None:
+            profile['features'][col] = column_profile
+    return profile
+
+def save_reference_profile(profile, filepath):
+    """Saves the drift reference profile to a JSON file."""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump(profile, f)
+    logging.info(f"Drift reference profile saved successfully at: {filepath}")
+
+def population_stability_index(reference_proportions, counts):
+    """Population Stability Index between reference bin proportions and live bin counts."""
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    expected = np.maximum(np.asarray(reference_proportions), PSI_EPSILON)
+    actual = np.maximum(counts / total, PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def histogram_quantiles(edges, counts, low, high, quantiles):
+    """Estimates quantiles from bin counts by linear interpolation inside each bin.
+
+    The outer bins are bounded by `low` and `high` (the observed min and max).
+    """
+    total = counts.sum()
+    if total == 0:
+        return [None] * len(quantiles)
+    bounds = np.concatenate([[low], edges, [high]])
+    cumulative = np.concatenate([[0], np.cumsum(counts)]) / total
+    return [float(np.interp(q, cumulative, bounds)) for q in quantiles]
@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from app.schemas import PredictionInput, MachineDataInput, TelemetryRecord, ErrorRecord
+
+PREDICT_PATH = '/api/v1/predict'
+
+# Typical ranges of the training telemetry, used to draw realistic sensor values.
+SENSOR_DISTRIBUTIONS = {
+    'volt': (170.0, 15.0),
+    'rotate': (446.0, 53.0),
+    'pressure': (100.0, 11.0),
+    'vibration': (40.0, 5.0),
+}
+ERROR_IDS = ['error1', 'error2', 'error3', 'error4', 'error5']
+ERROR_RATE_PER_HOUR = 0.01
+
+def generate_record(model_cls, machine_id, timestamp, rng):
+    """Fills a schema record field by field from its type annotation."""
+    record = {}
+    for name, field in model_cls.model_fields.items():
+        annotation = field.annotation
+        if annotation is datetime:
+            record[name] = timestamp.isoformat()
+        elif annotation is int:
+            record[name] = machine_id
+        elif annotation is float:
+            mean, std = SENSOR_DISTRIBUTIONS.get(name, (0.0, 1.0))
+            record[name] = round(float(rng.normal(mean, std)), 3)
+        elif annotation is str:
+            record[name] = rng.choice(ERROR_IDS)
+        else:
+            raise ValueError(f"Cannot generate values for field '{name}' of type {annotation}")
+    return record
+
+def generate_payload(batch_size, window_hours, rng):
+    """Generates a /predict payload of `batch_size` machines with `window_hours` hourly readings each."""
+    end = datetime(2025, 5, 24).replace(minute=0, second=0, microsecond=0)
+    timestamps = [end - timedelta(hours=h) for h in range(window_hours - 1, -1, -1)]
+    machine_id_field = MachineDataInput.model_fields['machineId'].alias
+    payload = []
+    for machine_id in range(1, batch_size + 1):
+        payload.append({
+            machine_id_field: machine_id,
+            'telemetryLast24h': [generate_record(TelemetryRecord, machine_id, ts, rng) for ts in timestamps],
+            'errorsLast24h': [
+                generate_record(ErrorRecord, machine_id, ts, rng)
+                for ts in timestamps if rng.random() < ERROR_RATE_PER_HOUR
+            ]
+        })
+    # Fail early if the generator drifted from the API schema.
+    PredictionInput.model_validate(payload)
+    return payload
+
+def read_rss_mb(pid=None):
+    """Returns the current RSS in MB of `pid` (default: this process) from /proc, or peak RSS as a fallback."""
+    status_path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(status_path) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    if pid is None:
+        # ru_maxrss is in KB on Linux and bytes on macOS.
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    return None
+
+async def run_step(client, payload, requests, concurrency):
+    """Sends `requests` copies of the payload with `concurrency` in flight and returns per-request stats."""
+    body = json.dumps(payload)
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post(PREDICT_PATH, content=body, headers={'Content-Type': 'application/json'})
+                failed = response.status_code != 200 or any(
+                    str(r['riskOfFailure']).startswith('Error') for r in response.json()
+                )
+            except Exception as e:
+                logging.warning(f"Request failed: {e}")
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += int(failed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+async def run_sweep(args):
+    if args.url:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=max(args.concurrency)))
+        client = httpx.AsyncClient(base_url=args.url, transport=transport, timeout=args.timeout)
+    else:
+        from main import app # Imported here so the model is only loaded in in-process mode.
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://loadtest', timeout=args.timeout)
+
+    rng = np.random.default_rng(args.seed)
+    rss_key = 'server_rss_mb' if args.url else 'process_rss_mb'
+    results = []
+    async with client:
+        for window_hours in args.window_hours:
+            for batch_size in args.batch_sizes:
+                payload = generate_payload(batch_size, window_hours, rng)
+                for concurrency in args.concurrency:
+                    await run_step(client, payload, 1, 1) # Warm-up, not measured.
+                    latencies, errors, elapsed = await run_step(client, payload, args.requests, concurrency)
+                    latencies_ms = np.array(latencies) * 1000
+                    result = {
+                        'batch_size': batch_size,
+                        'window_hours': window_hours,
+                        'concurrency': concurrency,
+                        'requests': len(latencies),
+                        'throughput_rps': len(latencies) / elapsed,
+                        'throughput_machines_per_s': len(latencies) * batch_size / elapsed,
+                        'latency_p50_ms': float(np.percentile(latencies_ms, 50)),
+                        'latency_p95_ms': float(np.percentile(latencies_ms, 95)),
+                        'latency_p99_ms': float(np.percentile(latencies_ms, 99)),
+                        'error_rate': errors / len(latencies),
+                        # In-process, the server shares this process with the load generator and its payloads.
+                        rss_key: read_rss_mb(args.server_pid) if args.url else read_rss_mb()
+                    }
+                    rss = f"{result[rss_key]:.0f} MB" if result[rss_key] is not None else "n/a"
+                    results.append(result)
+                    logging.info(
+                        f"batch={batch_size} window={window_hours}h concurrency={concurrency}: "
+                        f"{result['throughput_rps']:.2f} req/s, p50={result['latency_p50_ms']:.0f} ms, "
+                        f"p95={result['latency_p95_ms']:.0f} ms, p99={result['latency_p99_ms']:.0f} ms, "
+                        f"errors={result['error_rate']:.1%}, {rss_key.removesuffix('_mb')}={rss}"
+                    )
+    return results
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',')]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the /api/v1/predict endpoint in-process or against a running server.")
+    parser.add_argument("--url", type=str, default=None, help="Base URL of a running server (e.g. http://127.0.0.1:8000). Runs in-process through ASGI if omitted.")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID of the server process, to report its RSS when using --url.")
+    parser.add_argument("--batch-sizes", type=parse_int_list, default=[1, 10, 100, 1000, 5000], help="Comma-separated machines per request.")
+    parser.add_argument("--window-hours", type=parse_int_list, default=[24], help="Comma-separated telemetry window lengths in hours.")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 4], help="Comma-separated numbers of requests in flight.")
+    parser.add_argument("--requests", type=int, default=5, help="Measured requests per combination.")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Request timeout in seconds.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for payload generation.")
+    parser.add_argument("--output", type=str, default=None, help="Results JSON path (default: outputs/loadtest_<timestamp>.json).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    results = asyncio.run(run_sweep(args))
+
+    output_path = args.output or os.path.join('outputs', f"loadtest_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'target': args.url or 'in-process',
+            'results': results
+        }, f, indent=4)
+    logging.info(f"Load test results saved to {output_path}")
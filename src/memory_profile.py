@@ -0,0 +1,75 @@
+import logging
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+def read_rss_mb():
+    """Returns this process's current RSS in MB from /proc, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return None
+
+def read_peak_rss_mb():
+    """Returns this process's peak RSS in MB so far."""
+    # ru_maxrss is in KB on Linux and bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+class MemoryTracker:
+    """Logs time and memory used by each stage of a pipeline.
+
+    RSS is always reported. With `trace=True`, tracemalloc also reports the peak
+    of Python and NumPy/pandas allocations within each stage, at the cost of
+    slowing allocation-heavy code down.
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.stages = []
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager measuring the block it wraps as stage `name`."""
+        if self.trace:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        peak_rss_before = read_peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'seconds': time.perf_counter() - start,
+                'rss_mb': read_rss_mb(),
+                'peak_rss_mb': read_peak_rss_mb()
+            }
+            record['peak_rss_growth_mb'] = record['peak_rss_mb'] - peak_rss_before
+            message = f"[memory] {name}: {record['seconds']:.2f}s"
+            if self.trace:
+                traced, traced_peak = tracemalloc.get_traced_memory()
+                record['traced_peak_mb'] = (traced_peak - traced_before) / 2**20
+                record['traced_net_mb'] = (traced - traced_before) / 2**20
+                message += f", traced peak +{record['traced_peak_mb']:.0f} MB (net {record['traced_net_mb']:+.0f} MB)"
+            if record['rss_mb'] is not None:
+                message += f", RSS {record['rss_mb']:.0f} MB"
+            message += f", peak RSS {record['peak_rss_mb']:.0f} MB (+{record['peak_rss_growth_mb']:.0f} MB)"
+            logging.info(message)
+            self.stages.append(record)
+
+    def log_summary(self):
+        """Logs the process's peak RSS and the stage that used the most memory."""
+        if not self.stages:
+            return
+        key = 'traced_peak_mb' if self.trace else 'peak_rss_growth_mb'
+        worst = max(self.stages, key=lambda record: record[key])
+        logging.info(f"[memory] Peak RSS {read_peak_rss_mb():.0f} MB; largest stage: '{worst['stage']}'.")
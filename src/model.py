@@ -1,25 +1,87 @@
 from xgboost import XGBClassifier
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import classification_report, confusion_matrix, recall_score
 import xgboost as xgb
+import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 import joblib
+import hashlib
+import json
 import os
+import shutil
+import tempfile
 import logging
+from concurrent.futures import ProcessPoolExecutor
 
 
-def train_model(X_train, y_train, model_params, scale_pos_weight=None):
+def train_model(X_train, y_train, model_params, scale_pos_weight=None, sample_weight=None):
     """Trains the XGBoost model using parameters from config."""
     logging.info("Training XGBoost model...")
     model = XGBClassifier(
         eval_metric=model_params.get('eval_metric', 'logloss'),
         random_state=model_params.get('random_state', 42),
         scale_pos_weight=scale_pos_weight,
+        n_jobs=model_params.get('n_jobs'),
         use_label_encoder=False
     )
-    model.fit(X_train, y_train)
+    model.fit(X_train, y_train, sample_weight=sample_weight)
     logging.info("Model training complete.")
     return model
 
+def component_path(filepath, component):
+    """Returns the artifact path of a component model, e.g. models/model_comp1.joblib."""
+    root, ext = os.path.splitext(filepath)
+    return f"{root}_{component}{ext}"
+
+def _train_component_model(component, features_path, feature_names, y_train, model_params, filepath):
+    """Worker: trains and saves one component model on the memory-mapped feature matrix."""
+    X_shared = np.load(features_path, mmap_mode='r')
+    X_train = pd.DataFrame(X_shared, columns=feature_names, copy=False)
+
+    positives = int(y_train.sum())
+    scale_pos_weight = (len(y_train) - positives) / positives if positives > 0 else 1
+    model = train_model(X_train, y_train, model_params, scale_pos_weight=scale_pos_weight)
+    save_model(model, filepath)
+    return component, filepath, positives
+
+def train_component_models(X_train, y_by_component, model_params, filepaths, n_workers=None):
+    """Trains one model per failed component in parallel worker processes.
+
+    The feature matrix is written once to a memory-mapped .npy file that every
+    worker opens read-only, instead of being pickled into each process. Only the
+    small per-component label vectors are sent to the workers. Returns
+    {component: model path}.
+    """
+    n_workers = n_workers or min(len(y_by_component), os.cpu_count() or 1)
+    # Split the cores between workers so XGBoost threads do not oversubscribe the machine.
+    worker_params = dict(model_params, n_jobs=max(1, (os.cpu_count() or 1) // n_workers))
+
+    shared_dir = tempfile.mkdtemp(prefix='pdm_features_')
+    try:
+        features_path = os.path.join(shared_dir, 'X_train.npy')
+        X_shared = np.lib.format.open_memmap(features_path, mode='w+', dtype=np.float32, shape=X_train.shape)
+        X_shared[:] = X_train.to_numpy(dtype=np.float32)
+        X_shared.flush()
+        del X_shared
+
+        logging.info(f"Training {len(y_by_component)} component models with {n_workers} workers...")
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(
+                    _train_component_model, component, features_path, list(X_train.columns),
+                    np.asarray(y, dtype=np.int8), worker_params, filepaths[component]
+                )
+                for component, y in y_by_component.items()
+            ]
+            model_paths = {}
+            for future in futures:
+                component, filepath, positives = future.result()
+                logging.info(f"Component model '{component}' trained on {positives} positive rows.")
+                model_paths[component] = filepath
+        return model_paths
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
 def evaluate_training_model(model, X_test, y_test):
     """Evaluates the model on the test set during training."""
     logging.info("Evaluating model on the test set...")
@@ -30,6 +92,71 @@ def evaluate_training_model(model, X_test, y_test):
     logging.debug("\nConfusion Matrix:\n" + str(confusion_matrix(y_test, y_pred)))
     logging.info("\nClassification Report:\n" + classification_report(y_test, y_pred))
 
+def _cascade_predict(model, X, screen_trees, screen_threshold):
+    """Returns the cascade's predictions, the full model's predictions and the short-circuited rows."""
+    full_pred = model.predict(X)
+    screen_scores = model.predict_proba(X, iteration_range=(0, screen_trees))[:, 1]
+    short_circuit = screen_scores < screen_threshold
+    cascade_pred = np.where(short_circuit, (screen_scores >= 0.5).astype(int), full_pred)
+    return cascade_pred, full_pred, short_circuit
+
+def calibrate_cascade(model, X_val, y_val, screen_trees, recall_tolerance):
+    """Calibrates the screening threshold of a cascade over the first `screen_trees` trees.
+
+    The threshold is the lowest screening score that still lets all but a
+    `recall_tolerance` fraction of the full model's true positives through, so
+    short-circuiting the rest loses at most that share of recall. `X_val` must
+    be held out from both training and the final test evaluation.
+    """
+    y_val = np.asarray(y_val)
+    full_pred = model.predict(X_val)
+    screen_scores = model.predict_proba(X_val, iteration_range=(0, screen_trees))[:, 1]
+
+    caught = np.sort(screen_scores[(y_val == 1) & (full_pred == 1)])
+    if len(caught) > 0:
+        screen_threshold = float(caught[int(np.floor(recall_tolerance * len(caught)))])
+    else:
+        logging.warning("No true positives in validation data. Cascade will not short-circuit.")
+        screen_threshold = 0.0
+
+    cascade_pred, full_pred, short_circuit = _cascade_predict(model, X_val, screen_trees, screen_threshold)
+
+    cascade = {
+        'screen_trees': int(screen_trees),
+        'screen_threshold': screen_threshold,
+        'recall_tolerance': float(recall_tolerance),
+        'validation_recall_full': float(recall_score(y_val, full_pred, zero_division=0)),
+        'validation_recall_cascade': float(recall_score(y_val, cascade_pred, zero_division=0)),
+        'validation_short_circuit_rate': float(short_circuit.mean()) if len(short_circuit) else 0.0
+    }
+    logging.info(
+        f"Cascade calibrated: threshold={screen_threshold:.4f}, "
+        f"recall full={cascade['validation_recall_full']:.3f}, cascade={cascade['validation_recall_cascade']:.3f}, "
+        f"short-circuited={cascade['validation_short_circuit_rate']:.1%} of validation rows"
+    )
+    return cascade
+
+def evaluate_cascade(model, cascade, X_test, y_test):
+    """Returns the recall of the full model and of the calibrated cascade on the test split."""
+    cascade_pred, full_pred, short_circuit = _cascade_predict(model, X_test, cascade['screen_trees'], cascade['screen_threshold'])
+    metrics = {
+        'test_recall_full': float(recall_score(y_test, full_pred, zero_division=0)),
+        'test_recall_cascade': float(recall_score(y_test, cascade_pred, zero_division=0)),
+        'test_short_circuit_rate': float(short_circuit.mean()) if len(short_circuit) else 0.0
+    }
+    logging.info(
+        f"Cascade on test: recall full={metrics['test_recall_full']:.3f}, cascade={metrics['test_recall_cascade']:.3f}, "
+        f"short-circuited={metrics['test_short_circuit_rate']:.1%} of test rows"
+    )
+    return metrics
+
+def save_cascade_config(cascade, filepath):
+    """Saves the calibrated cascade settings to a JSON file."""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump(cascade, f, indent=4)
+    logging.info(f"Cascade settings saved successfully at: {filepath}")
+
 def plot_feature_importance(model, filepath):
     """Plots and saves feature importance to a file."""
     try:
@@ -56,6 +183,10 @@ def save_model(model, filepath):
         logging.error(f"Failed to save model at {filepath}. Error: {e}")
         raise
 
+def compute_model_version(model):
+    """Returns a short content hash of the booster, used to tag predictions and key caches."""
+    return hashlib.sha256(model.get_booster().save_raw()).hexdigest()[:12]
+
 def load_model(filepath):
     """Loads a previously trained model from the specified path."""
     try:
@@ -1,6 +1,8 @@
+import numpy as np
 import pandas as pd
-from data import load_and_merge_data, create_hourly_error_counts, preprocess_data
-from model import load_model
+from data import load_and_merge_data, add_maintenance_features, load_maintenance_index, create_hourly_error_counts, preprocess_data
+from model import load_model, compute_model_version
+from prediction_history import append_predictions
 import os
 import argparse
 import yaml
@@ -30,13 +32,60 @@ def load_config(config_path='config.yaml'):
         logging.error(f"Error loading configuration file: {e}")
         raise
 
+def resolve_maintenance_index(paths):
+    """Loads the shared maintenance index, the same one the API serves and refreshes."""
+    if os.path.exists(paths['maintenance_index']):
+        return load_maintenance_index(paths['maintenance_index'])
+    logging.warning("No maintenance index found. Maintenance features will be missing.")
+    return None
+
+def score_latest_per_machine(model, df_telemetry, df_errors, maintenance_index=None):
+    """Preprocesses telemetry and errors and scores the latest entry of each machine.
+
+    Returns a DataFrame with machineID, datetime, risk_of_failure, model_version
+    and predicted_at, empty if nothing could be scored.
+    """
+    model_features = model.feature_names_in_.tolist()
+
+    hourly_error_counts = create_hourly_error_counts(df_errors)
+    df_final = preprocess_data(df_telemetry, hourly_error_counts, is_train=False)
+
+    if df_final.empty:
+        logging.warning("No data after preprocessing. Cannot predict.")
+        return pd.DataFrame()
+
+    last_dates = df_final.groupby('machineID')['datetime'].max().reset_index()
+    latest_data = pd.merge(df_final, last_dates, on=['machineID', 'datetime'], how='inner')
+
+    if latest_data.empty:
+        logging.warning("No latest data found. Cannot predict.")
+        return pd.DataFrame()
+
+    if maintenance_index is not None:
+        latest_data = add_maintenance_features(latest_data, maintenance_index)
+
+    current_features = [col for col in latest_data.columns if col in model_features]
+    missing_cols = set(model_features) - set(current_features)
+    for col in missing_cols:
+        latest_data[col] = 0 
+
+    probabilities = model.predict_proba(latest_data[model_features])[:, 1]
+
+    return pd.DataFrame({
+        'machineID': latest_data['machineID'].to_numpy(),
+        'datetime': latest_data['datetime'].to_numpy(),
+        'risk_of_failure': probabilities,
+        'model_version': compute_model_version(model),
+        'predicted_at': pd.Timestamp.now().floor('s')
+    })
+
 def predict_latest_failures(config):
     """Performs failure predictions using new data from config paths."""
     
     paths = config['paths']
     new_data_folder = paths['new_data_folder']
     model_path = paths['model_output']
-    output_path = paths['predictions_output']
+    history_path = paths['predictions_history']
 
     telemetry_path = os.path.join(new_data_folder, 'PdM_telemetry.csv')
     errors_path = os.path.join(new_data_folder, 'PdM_errors.csv')
@@ -52,50 +101,24 @@ def predict_latest_failures(config):
 
     try:
         model = load_model(model_path)
-        model_features = model.feature_names_in_.tolist()
 
         logging.info(f"Loading new data from {new_data_folder}...")
         nuevos_df_telemetry, nuevos_df_errors, _ = load_and_merge_data(telemetry_path, errors_path)
         
-        logging.info("Preprocessing new data...")
-        nuevos_hourly_error_counts = create_hourly_error_counts(nuevos_df_errors)
-        nuevos_df_final = preprocess_data(nuevos_df_telemetry, nuevos_hourly_error_counts, is_train=False)
+        logging.info("Preprocessing and predicting latest data per machine...")
+        maintenance_index = resolve_maintenance_index(paths)
+        resultados_prediccion = score_latest_per_machine(model, nuevos_df_telemetry, nuevos_df_errors, maintenance_index)
 
-        if nuevos_df_final.empty:
-            logging.warning("No data after preprocessing. Cannot predict.")
+        if resultados_prediccion.empty:
             return
 
-        logging.info("Filtering for latest data per machine...")
-        last_dates = nuevos_df_final.groupby('machineID')['datetime'].max().reset_index()
-        latest_data = pd.merge(nuevos_df_final, last_dates, on=['machineID', 'datetime'], how='inner')
-
-        if latest_data.empty:
-            logging.warning("No latest data found. Cannot predict.")
-            return
-
-        logging.info("Aligning features and predicting...")
-        current_features = [col for col in latest_data.columns if col in model_features]
-        missing_cols = set(model_features) - set(current_features)
-        for col in missing_cols:
-            latest_data[col] = 0 
-        
-        X_nuevos_latest = latest_data[model_features]
-        nuevas_probabilidades_decimal = model.predict_proba(X_nuevos_latest)[:, 1]
-        nuevas_probabilidades_porcentaje = nuevas_probabilidades_decimal * 100
-        nuevas_probabilidades_formateadas = [f"{prob:.1f}%" for prob in nuevas_probabilidades_porcentaje]
-
-        resultados_prediccion = pd.DataFrame({
-            'machineID': latest_data['machineID'],
-            'datetime': latest_data['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S'),
-            'failure risk (24h)': nuevas_probabilidades_formateadas
-        })
-
         print("\nFailure Prediction Results (Based on the last entry per machine):")
-        print(resultados_prediccion)
+        print(resultados_prediccion.assign(
+            risk_of_failure=[f"{prob * 100:.1f}%" for prob in resultados_prediccion['risk_of_failure']]
+        ))
 
-        logging.info(f"Saving predictions to {output_path}...")
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        resultados_prediccion.to_csv(output_path, index=False)
+        logging.info(f"Saving predictions to {history_path}...")
+        append_predictions(resultados_prediccion, history_path)
         logging.info(f"Predictions saved successfully.")
         logging.info("--- Prediction Process Finished Successfully ---")
 
@@ -103,6 +126,38 @@ def predict_latest_failures(config):
         logging.error(f"An error occurred during prediction: {e}", exc_info=True)
         logging.info("--- Prediction Process Failed ---")
 
+def predict_in_chunks(config, telemetry_path, errors_path, output_path, chunk_machines=100, progress_callback=None):
+    """Scores the latest entry of every machine in a telemetry file, a chunk of machines at a time.
+
+    Predictions of each chunk are appended to the Parquet dataset at `output_path`
+    as soon as the chunk is done. `progress_callback(rows_done, rows_total,
+    machines_done, machines_total)` is called after each chunk.
+    """
+    paths = config['paths']
+    model = load_model(paths['model_output'])
+    maintenance_index = resolve_maintenance_index(paths)
+
+    df_telemetry, df_errors, _ = load_and_merge_data(telemetry_path, errors_path)
+    machine_ids = df_telemetry['machineID'].unique()
+    telemetry_by_machine = df_telemetry.groupby('machineID').indices
+    errors_by_machine = df_errors.groupby('machineID').indices
+
+    rows_done, machines_done = 0, 0
+    for start in range(0, len(machine_ids), chunk_machines):
+        chunk_ids = machine_ids[start:start + chunk_machines]
+        telemetry_rows = np.concatenate([telemetry_by_machine[m] for m in chunk_ids])
+        error_rows = [errors_by_machine[m] for m in chunk_ids if m in errors_by_machine]
+        df_chunk_errors = df_errors.iloc[np.concatenate(error_rows)] if error_rows else df_errors.iloc[0:0]
+
+        df_predictions = score_latest_per_machine(model, df_telemetry.iloc[telemetry_rows], df_chunk_errors, maintenance_index)
+        if not df_predictions.empty:
+            append_predictions(df_predictions, output_path)
+
+        rows_done += len(telemetry_rows)
+        machines_done += len(chunk_ids)
+        if progress_callback is not None:
+            progress_callback(rows_done, len(df_telemetry), machines_done, len(machine_ids))
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Perform failure predictions on new data.")
     parser.add_argument("--config", type=str, default='config.yaml', help="Path to the configuration file.")
@@ -0,0 +1,52 @@
+import pandas as pd
+import os
+import logging
+
+PARTITION_COLUMN = 'prediction_date'
+HISTORY_COLUMNS = ['machineID', 'datetime', 'risk_of_failure', 'model_version', 'predicted_at', PARTITION_COLUMN]
+
+def append_predictions(df_predictions, dataset_path):
+    """Appends predictions to the Parquet history dataset, partitioned by prediction date.
+
+    Expects the columns machineID, datetime (feature timestamp), risk_of_failure
+    (probability in [0, 1]), model_version and predicted_at. Each call writes new
+    files into the date partitions, so earlier runs are never overwritten.
+    """
+    df = df_predictions.copy()
+    df[PARTITION_COLUMN] = df['predicted_at'].dt.strftime('%Y-%m-%d')
+    # Sorting by machine keeps row-group statistics tight, so machine filters can skip data.
+    df = df.sort_values(by=['machineID', 'datetime'])[HISTORY_COLUMNS]
+
+    os.makedirs(dataset_path, exist_ok=True)
+    df.to_parquet(dataset_path, engine='pyarrow', partition_cols=[PARTITION_COLUMN], index=False)
+    logging.info(f"Appended {len(df)} predictions to {dataset_path}")
+
+def read_predictions(dataset_path, machine_id=None, date=None, start_date=None, end_date=None, columns=None):
+    """Reads prediction history, optionally for one machine and/or a date or date range.
+
+    Date filters are applied to the partition column, so only the matching
+    partitions are opened; `columns` limits which columns are read.
+    """
+    filters = []
+    if date is not None:
+        filters.append((PARTITION_COLUMN, '==', str(date)))
+    if start_date is not None:
+        filters.append((PARTITION_COLUMN, '>=', str(start_date)))
+    if end_date is not None:
+        filters.append((PARTITION_COLUMN, '<=', str(end_date)))
+    if machine_id is not None:
+        filters.append(('machineID', '==', int(machine_id)))
+
+    if not os.path.exists(dataset_path):
+        return pd.DataFrame(columns=columns or HISTORY_COLUMNS)
+
+    return pd.read_parquet(dataset_path, engine='pyarrow', columns=columns, filters=filters or None)
+
+def read_machine_history(dataset_path, machine_id, columns=None):
+    """Returns all predictions of one machine, oldest first."""
+    df = read_predictions(dataset_path, machine_id=machine_id, columns=columns)
+    return df.sort_values(by='predicted_at') if 'predicted_at' in df.columns else df
+
+def read_day(dataset_path, date, columns=None):
+    """Returns all predictions made on one date (YYYY-MM-DD)."""
+    return read_predictions(dataset_path, date=date, columns=columns)
@@ -1,11 +1,16 @@
 import pandas as pd
-from data import load_and_merge_data, create_hourly_error_counts, preprocess_data, prepare_data_for_training, split_data
-from model import train_model, plot_feature_importance, save_model 
-from evaluate import evaluate_and_save, evaluate_on_specific_machines
+from data import COMPONENTS, add_horizon_labels, load_and_merge_data, load_machine_data, build_maintenance_index, add_maintenance_features, save_maintenance_index, create_hourly_error_counts, preprocess_data, label_name, prepare_data_for_training, downsample_negatives, split_data
+from model import component_path, train_model, train_component_models, load_model, calibrate_cascade, evaluate_cascade, save_cascade_config, plot_feature_importance, save_model 
+from evaluate import evaluate_and_save, evaluate_on_specific_machines, save_metrics
+from drift import build_reference_profile, save_reference_profile
+from memory_profile import MemoryTracker
 import argparse
+import json
 import os
+import time
 import yaml 
 import logging 
+from sklearn.metrics import precision_score, recall_score, f1_score, roc_auc_score, brier_score_loss
 
 def setup_logging(log_path):
     """Configure logging."""
@@ -19,6 +24,61 @@ def setup_logging(log_path):
         ]
     )
 
+DEFAULT_HORIZON = 24 # Horizon (hours) served by the API through paths['model_output'].
+
+def horizon_path(filepath, horizon):
+    """Returns the artifact path for a horizon, e.g. models/model_48h.joblib for 48h.
+
+    The default 24h horizon keeps the configured path unchanged.
+    """
+    if horizon == DEFAULT_HORIZON:
+        return filepath
+    root, ext = os.path.splitext(filepath)
+    return f"{root}_{horizon}h{ext}"
+
+def report_sampling_rates(X_train, y_train, df_train, X_test, y_test, model_cfg, scale_pos_weight, rates, random_state, output_path):
+    """Fits one model per negative sampling rate and reports fit time, metrics and calibration.
+
+    Calibration is checked by comparing the mean predicted probability and Brier
+    score of each rate against rate 1.0 (all negatives).
+    """
+    report = []
+    for rate in rates:
+        if rate < 1:
+            X_fit, y_fit, sample_weight = downsample_negatives(X_train, y_train, df_train, rate, random_state)
+        else:
+            X_fit, y_fit, sample_weight = X_train, y_train, None
+
+        start = time.perf_counter()
+        model = train_model(X_fit, y_fit, model_cfg, scale_pos_weight=scale_pos_weight, sample_weight=sample_weight)
+        fit_seconds = time.perf_counter() - start
+
+        probabilities = model.predict_proba(X_test[X_train.columns])[:, 1]
+        y_pred = (probabilities >= 0.5).astype(int)
+        entry = {
+            'negative_rate': rate,
+            'train_rows': int(len(y_fit)),
+            'fit_seconds': fit_seconds,
+            'precision': precision_score(y_test, y_pred, zero_division=0),
+            'recall': recall_score(y_test, y_pred, zero_division=0),
+            'f1': f1_score(y_test, y_pred, zero_division=0),
+            'roc_auc': roc_auc_score(y_test, probabilities) if y_test.nunique() > 1 else None,
+            'brier_score': brier_score_loss(y_test, probabilities),
+            'mean_predicted_risk': float(probabilities.mean())
+        }
+        report.append(entry)
+        logging.info(
+            f"Negative rate {rate}: {entry['train_rows']} rows, fit {fit_seconds:.2f}s, "
+            f"recall={entry['recall']:.3f}, precision={entry['precision']:.3f}, "
+            f"brier={entry['brier_score']:.4f}, mean risk={entry['mean_predicted_risk']:.4f}"
+        )
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    logging.info(f"Sampling report saved to: {output_path}")
+    return report
+
 def load_config(config_path='config.yaml'):
     """Loading YAML configuration."""
     try:
@@ -42,39 +102,131 @@ if __name__ == "__main__":
         train_params = config['training']
         model_cfg = config['model_params']
 
+        memory = MemoryTracker(trace=train_params.get('trace_memory', False))
+        horizons = train_params.get('horizons', [DEFAULT_HORIZON])
+        sampling_cfg = train_params.get('sampling', {})
+
         logging.info("Loading and Preprocessing data...")
-        df_telemetry, df_errors, df_failures = load_and_merge_data(paths['training_telemetry'], paths['training_errors'], paths['training_failures'])
-        hourly_error_counts = create_hourly_error_counts(df_errors)
-        df_final = preprocess_data(df_telemetry, hourly_error_counts, df_failures=df_failures, is_train=True)
-        X, y, features = prepare_data_for_training(df_final)
-        X_train, X_test, y_train, y_test = split_data(X, y, df_final, train_size=train_params['train_size'])
-
-        # --- Calcular scale_pos_weight ---
-        scale_pos_weight_value = 1
-        if 1 in y_train.value_counts() and y_train.value_counts()[1] > 0:
-            neg_cases = y_train.value_counts()[0]
-            pos_cases = y_train.value_counts()[1]
-            scale_pos_weight_value = neg_cases / pos_cases
-            logging.info(f"Calculated Scale Pos Weight: {scale_pos_weight_value:.2f}")
-        else:
-            logging.warning("No positive cases in training data. Using scale_pos_weight = 1.")
-
-        # --- Training the model ---
-        X_train_features = X_train[features]
-        model = train_model(X_train_features, y_train, model_cfg, scale_pos_weight=scale_pos_weight_value)
-
-        # --- Model evaluation ---
-        evaluate_and_save(
-            model, 
-            X_test,
-            y_test, 
-            paths['evaluation_metrics'], 
-            paths['confusion_matrix_plot']
-        )
-        evaluate_on_specific_machines(model, X_test, y_test)
+        with memory.stage('load data'):
+            df_telemetry, df_errors, df_failures = load_and_merge_data(paths['training_telemetry'], paths['training_errors'], paths['training_failures'])
+            hourly_error_counts = create_hourly_error_counts(df_errors)
+        with memory.stage('preprocess'):
+            df_final = preprocess_data(df_telemetry, hourly_error_counts, df_failures=df_failures, is_train=True, horizons=horizons)
+
+        logging.info("Building maintenance index and adding maintenance features...")
+        with memory.stage('maintenance features'):
+            df_machines, df_maint = load_machine_data(paths['training_machines'], paths['training_maint'])
+            # The training maintenance log covers the same period as the training telemetry.
+            maintenance_index = build_maintenance_index(df_machines, df_maint, coverage_end=df_telemetry['datetime'].max())
+            df_final = add_maintenance_features(df_final, maintenance_index)
+
+        for horizon in horizons:
+            label = label_name(horizon)
+            logging.info(f"--- Training model for label '{label}' ---")
+
+            with memory.stage(f'split {label}'):
+                X, y, features = prepare_data_for_training(df_final, label=label)
+                X_train, X_test, y_train, y_test = split_data(X, y, df_final, train_size=train_params['train_size'])
+
+            # --- Cascade validation slice (served model only) ---
+            # Held out from the end of the training split, so the screening threshold
+            # is neither fit on training rows nor tuned on the test split it is reported on.
+            calibrate = horizon == DEFAULT_HORIZON and config.get('cascade', {}).get('enabled', False)
+            if calibrate:
+                val_start = int(len(X_train) * (1 - config['cascade'].get('validation_size', 0.2)))
+                X_val, y_val = X_train.iloc[val_start:], y_train.iloc[val_start:]
+                X_train, y_train = X_train.iloc[:val_start], y_train.iloc[:val_start]
+
+            # --- Calcular scale_pos_weight ---
+            scale_pos_weight_value = 1
+            if 1 in y_train.value_counts() and y_train.value_counts()[1] > 0:
+                neg_cases = y_train.value_counts()[0]
+                pos_cases = y_train.value_counts()[1]
+                scale_pos_weight_value = neg_cases / pos_cases
+                logging.info(f"Calculated Scale Pos Weight: {scale_pos_weight_value:.2f}")
+            else:
+                logging.warning("No positive cases in training data. Using scale_pos_weight = 1.")
+
+            # --- Negative downsampling (optional) ---
+            X_train_features = X_train # prepare_data_for_training already selected `features`
+            df_train = df_final.iloc[:len(X_train)]
+            X_fit, y_fit, sample_weight = X_train_features, y_train, None
+            negative_rate = sampling_cfg.get('negative_rate', 1.0)
+            if sampling_cfg.get('enabled', False):
+                if horizon == DEFAULT_HORIZON and sampling_cfg.get('report_rates'):
+                    report_sampling_rates(
+                        X_train_features, y_train, df_train, X_test, y_test, model_cfg, scale_pos_weight_value,
+                        sampling_cfg['report_rates'], sampling_cfg.get('random_state', 42), paths['sampling_report']
+                    )
+                if negative_rate < 1:
+                    X_fit, y_fit, sample_weight = downsample_negatives(
+                        X_train_features, y_train, df_train, negative_rate, sampling_cfg.get('random_state', 42)
+                    )
+
+            # --- Training the model ---
+            start = time.perf_counter()
+            with memory.stage(f'fit {label}'):
+                model = train_model(X_fit, y_fit, model_cfg, scale_pos_weight=scale_pos_weight_value, sample_weight=sample_weight)
+            logging.info(f"Model fit in {time.perf_counter() - start:.2f}s on {len(y_fit)} rows.")
+
+            # --- Model evaluation ---
+            with memory.stage(f'evaluate {label}'):
+                evaluate_and_save(
+                    model, 
+                    X_test,
+                    y_test, 
+                    horizon_path(paths['evaluation_metrics'], horizon), 
+                    horizon_path(paths['confusion_matrix_plot'], horizon)
+                )
+                evaluate_on_specific_machines(model, X_test, y_test)
+
+            plot_feature_importance(model, filepath=horizon_path(paths['feature_importance_plot'], horizon))
+            save_model(model, filepath=horizon_path(paths['model_output'], horizon))
+
+            # --- Cascade calibration (served model only) ---
+            if calibrate:
+                cascade = calibrate_cascade(
+                    model,
+                    X_val,
+                    y_val,
+                    config['cascade']['screen_trees'],
+                    config['cascade']['recall_tolerance']
+                )
+                cascade.update(evaluate_cascade(model, cascade, X_test[features], y_test))
+                save_cascade_config(cascade, paths['cascade_config'])
+
+            # --- Drift reference profile (served model only) ---
+            if horizon == DEFAULT_HORIZON:
+                n_bins = config.get('drift', {}).get('n_bins', 20)
+                profile = build_reference_profile(df_telemetry, X_train_features, n_bins=n_bins)
+                save_reference_profile(profile, paths['drift_reference'])
+
+        # --- Per-component models (served horizon only) ---
+        if train_params.get('component_models', False):
+            logging.info("--- Training per-component models ---")
+            with memory.stage('component models'):
+                df_final = add_horizon_labels(df_final, [DEFAULT_HORIZON], components=COMPONENTS)
+                X, _, features = prepare_data_for_training(df_final, label=label_name(DEFAULT_HORIZON))
+                split_point = int(len(df_final) * train_params['train_size'])
+                y_by_component = {
+                    comp: df_final[label_name(DEFAULT_HORIZON, comp)].iloc[:split_point]
+                    for comp in COMPONENTS
+                }
+                model_paths = train_component_models(
+                    X.iloc[:split_point],
+                    y_by_component,
+                    model_cfg,
+                    {comp: component_path(paths['model_output'], comp) for comp in COMPONENTS},
+                    n_workers=train_params.get('component_workers')
+                )
+                X_test_features = X.iloc[split_point:]
+                for comp, model_path in model_paths.items():
+                    y_test_comp = df_final[label_name(DEFAULT_HORIZON, comp)].iloc[split_point:]
+                    y_pred_comp = load_model(model_path).predict(X_test_features)
+                    save_metrics(y_test_comp, y_pred_comp, component_path(paths['evaluation_metrics'], comp))
 
-        plot_feature_importance(model, filepath=paths['feature_importance_plot'])
-        save_model(model, filepath=paths['model_output'])
+        save_maintenance_index(maintenance_index, filepath=paths['maintenance_index'])
+        memory.log_summary()
 
         logging.info("--- Training Process Finished Successfully ---")
 